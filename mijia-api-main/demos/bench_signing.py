@@ -0,0 +1,62 @@
+import base64
+import gzip
+import json
+import timeit
+
+from Crypto.Cipher import ARC4
+
+from mijiaAPI.miutils import (
+    RequestSigner,
+    decrypt,
+    gen_nonce,
+    generate_enc_params,
+    get_signed_nonce,
+)
+
+
+# 对比每次请求签名/加解密的耗时：逐个参数初始化 ARC4（旧） vs RequestSigner（新）
+# 不需要登录，使用随机生成的 ssecurity
+ssecurity = base64.b64encode(bytes(range(16))).decode()
+uri = "/miotspec/prop/get"
+data = json.dumps({
+    "params": [{"did": "1234567890", "siid": 2, "piid": piid} for piid in range(1, 11)],
+    "datasource": 1,
+}, separators=(",", ":"))
+body = json.dumps({"code": 0, "result": [
+    {"did": "1234567890", "siid": 2, "piid": piid, "value": piid * 10, "code": 0, "updateTime": 1700000000}
+    for piid in range(1, 11)
+]})
+
+
+def encrypt_response(nonce: str, payload: bytes) -> str:
+    cipher = ARC4.new(base64.b64decode(get_signed_nonce(ssecurity, nonce)))
+    cipher.encrypt(bytes(1024))
+    return base64.b64encode(cipher.encrypt(payload)).decode()
+
+
+nonce = gen_nonce()
+responses = {
+    "plain": encrypt_response(nonce, body.encode()),
+    "gzip": encrypt_response(nonce, gzip.compress(body.encode())),
+}
+
+
+def legacy(response: str):
+    signed_nonce = get_signed_nonce(ssecurity, nonce)
+    generate_enc_params(uri, "POST", signed_nonce, nonce, {"data": data}, ssecurity)
+    decrypt(ssecurity, nonce, response)
+
+
+signer = RequestSigner(ssecurity)
+
+
+def cached(response: str):
+    _, keystream = signer.sign(uri, "POST", {"data": data}, nonce=nonce)
+    keystream.decrypt(response)
+
+
+number = 5000
+for kind, response in responses.items():
+    t_legacy = timeit.timeit(lambda: legacy(response), number=number) / number * 1e6
+    t_cached = timeit.timeit(lambda: cached(response), number=number) / number * 1e6
+    print(f"{kind:>5} 响应: 旧 {t_legacy:7.1f} us/请求, RequestSigner {t_cached:7.1f} us/请求, 加速 {t_legacy / t_cached:.2f}x")
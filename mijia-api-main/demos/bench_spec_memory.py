@@ -0,0 +1,97 @@
+import gc
+import tempfile
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from mijiaAPI import DeviceRegistry, PropertyCache, mijiaDevice
+from mijiaAPI.devices import _device_specs
+from mijiaAPI.specstore import open_spec_store
+
+
+# 对比 500 个设备（20 个型号）的规格对象内存占用：每个设备各自构建（旧） vs 同型号共享 DeviceSpec（新）
+# 不需要登录，使用随机生成的设备列表和规格
+N_MODELS = 20
+N_DEVICES = 500
+N_PROPS = 30
+
+
+def make_spec(i: int) -> dict:
+    return {
+        "name": f"测试设备 {i}",
+        "model": f"bench.model.v{i}",
+        "properties": [{
+            "name": f"prop-name-{j}",
+            "description": f"属性 {j}",
+            "type": "uint",
+            "rw": "rw",
+            "unit": "percentage",
+            "range": [0, 100, 1],
+            "value-list": [{"value": v, "description": f"档位 {v}"} for v in range(3)] if j % 3 == 0 else None,
+            "method": {"siid": 2, "piid": j + 1},
+        } for j in range(N_PROPS)],
+        "actions": [{"name": f"action-{j}", "description": f"动作 {j}", "method": {"siid": 3, "aiid": j + 1}}
+                    for j in range(3)],
+    }
+
+
+class LegacyProp():
+    def __init__(self, prop_dict: dict):
+        self.name = prop_dict["name"]
+        self.desc = prop_dict["description"]
+        self.type = prop_dict["type"]
+        self.rw = prop_dict["rw"]
+        self.unit = prop_dict["unit"]
+        self.range = prop_dict["range"]
+        self.value_list = prop_dict.get("value-list", None)
+        self.method = prop_dict["method"]
+
+
+class LegacyAction():
+    def __init__(self, act_dict: dict):
+        self.name = act_dict["name"]
+        self.desc = act_dict["description"]
+        self.method = act_dict["method"]
+
+
+def legacy_device(dev_info: dict) -> tuple:
+    # 旧版 mijiaDevice.__init__ 的做法：每个设备单独构建对象，带 '-' 的名称再存一份 '_' 别名
+    prop_list = {}
+    for prop in dev_info["properties"]:
+        prop_obj = LegacyProp(prop)
+        prop_list[prop["name"]] = prop_obj
+        if "-" in prop["name"]:
+            prop_list[prop["name"].replace("-", "_")] = prop_obj
+    action_list = {act["name"]: LegacyAction(act) for act in dev_info["actions"]}
+    return prop_list, action_list
+
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    objs = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, objs
+
+
+cache_dir = Path(tempfile.mkdtemp())
+store = open_spec_store(cache_dir)
+specs = [make_spec(i) for i in range(N_MODELS)]
+for spec in specs:
+    store.put(spec["model"], spec)
+devices = [{"did": str(100000 + i), "name": f"设备 {i}", "model": specs[i % N_MODELS]["model"]}
+           for i in range(N_DEVICES)]
+api = SimpleNamespace(auth_data_path=cache_dir / "auth.json", prop_cache=PropertyCache())
+api.device_registry = DeviceRegistry(api)
+api.device_registry.load(devices)
+
+legacy_size, legacy = measure(lambda: [legacy_device(store.get(device["model"])) for device in devices])
+del legacy
+_device_specs.clear()
+shared_size, shared = measure(lambda: [mijiaDevice(api, did=device["did"]) for device in devices])
+
+print(f"{N_DEVICES} 个设备 / {N_MODELS} 个型号 / 每个型号 {N_PROPS} 个属性")
+print(f"  旧: 每个设备独立构建   {legacy_size / 1024:8.1f} KiB")
+print(f"  新: 同型号共享规格     {shared_size / 1024:8.1f} KiB ({legacy_size / shared_size:.1f}x)")
+print(f"  不同的 DeviceSpec 对象: {len({id(device.spec) for device in shared})}")
@@ -12,7 +12,7 @@ for device in devices:
         did = device['did']
         break
 
-# sleep_time 是可选的，默认是 0.5
+# sleep_time 是可选的，默认是 0（不等待）
 # 设置后获取属性值时需要等待一段时间，否则可能获取到不正确的
 device = mijiaDevice(api, did, sleep_time=1)
 print(device)
@@ -1,6 +1,7 @@
 import time
 
 from mijiaAPI import mijiaAPI
+from mijiaAPI.statstore import parse_stat_value
 
 
 api = mijiaAPI(".mijia-api-data/auth.json")
@@ -29,7 +30,7 @@ ret = api.get_statistics({
 """
 
 for item in ret:
-    value = eval(item['value'])[0]
+    value = parse_stat_value(item['value'])
     ts = item['time']
     date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
     print(f'{date}: {value}')
@@ -1,5 +1,6 @@
+from .aio import AsyncMijiaAPI
 from .apis import mijiaAPI
-from .devices import get_device_info, mijiaDevice
+from .devices import DeviceSpec, get_device_info, get_device_spec, mijiaDevice, warm_spec_cache
 from .errors import (
     APIError,
     DeviceActionError,
@@ -10,14 +11,42 @@ from .errors import (
     LoginError,
     MultipleDevicesFoundError,
 )
+from .metrics import MetricsRegistry
 from .miutils import decrypt
+from .poller import PropertyPoller
+from .propcache import PropertyCache
+from .ratelimit import RateLimiter
+from .registry import DeviceRegistry
+from .specstore import SpecStore
+from .statsframe import StatsFrame, decode_statistics
+from .statstore import StatsStore
+from .sync import DeviceDelta, DeviceSync
+from .tracing import ChromeTraceExporter, SpanHook, tracer
 from .version import version as __version__
 
 
 __all__ = [
     "mijiaAPI",
+    "AsyncMijiaAPI",
     "mijiaDevice",
+    "DeviceSpec",
     "get_device_info",
+    "get_device_spec",
+    "warm_spec_cache",
+    "DeviceRegistry",
+    "DeviceSync",
+    "DeviceDelta",
+    "PropertyPoller",
+    "PropertyCache",
+    "MetricsRegistry",
+    "ChromeTraceExporter",
+    "SpanHook",
+    "tracer",
+    "RateLimiter",
+    "SpecStore",
+    "StatsStore",
+    "StatsFrame",
+    "decode_statistics",
     "APIError",
     "DeviceActionError",
     "DeviceGetError",
@@ -7,7 +7,10 @@ from pathlib import Path
 from typing import Optional
 
 from .apis import mijiaAPI
-from .devices import get_device_info, mijiaDevice
+from .devices import get_device_info, mijiaDevice, warm_spec_cache
+from .metrics import MetricsRegistry
+from .sync import DeviceSync
+from .tracing import ChromeTraceExporter, tracer
 from .version import version
 
 
@@ -61,6 +64,40 @@ def parse_args(args):
         help="获取设备信息，指定设备model，先使用 --list_devices 获取",
         metavar='DEVICE_MODEL',
     )
+    parser.add_argument(
+        '--sync_devices', '--sync-devices',
+        action='store_true',
+        help="同步设备列表，显示与上次同步相比的变化（新增、移除、改名、移动、上下线、固件更新）",
+    )
+    parser.add_argument(
+        '--warm_spec_cache', '--warm-spec-cache',
+        action='store_true',
+        help="并发预取所有设备的规格信息并写入缓存",
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help="执行完成后输出请求指标（各接口的请求数、错误码、字节数与各阶段耗时）",
+    )
+    parser.add_argument(
+        '--stats_format', '--stats-format',
+        type=str,
+        choices=['text', 'json', 'prometheus'],
+        default='text',
+        help="请求指标的输出格式，默认为文本摘要",
+    )
+    parser.add_argument(
+        '--metrics_file', '--metrics-file',
+        type=Path,
+        help="运行期间每 15 秒并在退出时将请求指标以 Prometheus 文本格式写入该文件，供 sidecar 抓取",
+        metavar='METRICS_FILE',
+    )
+    parser.add_argument(
+        '--trace',
+        type=Path,
+        help="记录本次运行各阶段的耗时，保存为 Chrome trace-event JSON，可在 Perfetto 中打开",
+        metavar='TRACE_FILE',
+    )
     parser.add_argument(
         '--run',
         type=str,
@@ -140,7 +177,21 @@ def parse_args(args):
         help="需要设定的属性值",
         required=True,
     )
-    return parser.parse_args(args)
+    args = parser.parse_args(args)
+    if (args.stats or args.metrics_file) and not has_request_command(args):
+        parser.error("--stats 和 --metrics_file 需要与发起请求的命令一起使用（指标只统计本次运行中的请求）")
+    return args
+
+def has_request_command(args) -> bool:
+    return bool(args.list_devices or
+                args.list_homes or
+                args.list_scenes or
+                args.list_consumable_items or
+                args.run_scene or
+                args.sync_devices or
+                args.warm_spec_cache or
+                args.run or
+                getattr(args, 'func', None) is not None)
 
 def init_api(auth_path: Path) -> mijiaAPI:
     class APIUnavailableError(Exception):
@@ -152,7 +203,7 @@ def init_api(auth_path: Path) -> mijiaAPI:
         try:
             api = mijiaAPI(auth_data_path=auth_path)
             if not api.available:
-                api._refresh_token()
+                api._refresh_token(force=True)
             if not api.available:
                 raise APIUnavailableError()
             return api
@@ -196,7 +247,7 @@ def get_homes_list(api: mijiaAPI, verbose: bool = True, device_mapping: Optional
     return home_mapping
 
 def get_devices_list(api: mijiaAPI, verbose: bool = True) -> dict:
-    devices = api.get_devices_list() + api.get_shared_devices_list()
+    devices = api.device_registry.refresh(include_shared=True)
     if verbose:
         print("设备列表:")
         for device in devices:
@@ -207,6 +258,30 @@ def get_devices_list(api: mijiaAPI, verbose: bool = True) -> dict:
     device_mapping = {device['did']: device for device in devices}
     return device_mapping
 
+def sync_devices(api: mijiaAPI) -> dict:
+    sync = DeviceSync(api)
+    first_sync = sync.synced_at is None
+    delta = sync.refresh()
+    if first_sync:
+        print(f"首次同步，共 {len(delta.added)} 个设备，快照已保存到 {sync.snapshot_file}")
+        return delta.to_dict()
+    if not delta:
+        print("设备列表没有变化")
+        return delta.to_dict()
+    for device in delta.added:
+        print(f"  + 新增: {device['name']} ({device['did']}, {device['model']})")
+    for device in delta.removed:
+        print(f"  - 移除: {device['name']} ({device['did']})")
+    for change in delta.renamed:
+        print(f"  * 改名: {change['old']} -> {change['new']} ({change['did']})")
+    for change in delta.moved:
+        print(f"  * 移动: {change['did']} {change['old']} -> {change['new']}")
+    for change in delta.online:
+        print(f"  * {'上线' if change['isOnline'] else '离线'}: {change['name']} ({change['did']})")
+    for change in delta.firmware:
+        print(f"  * 固件更新: {change['name']} ({change['did']}) {change['old']} -> {change['new']}")
+    return delta.to_dict()
+
 def get_scenes_list(api: mijiaAPI, verbose: bool = True, home_mapping: Optional[dict] = None) -> dict:
     if home_mapping is None:
         home_mapping = get_homes_list(api, verbose=False)
@@ -256,15 +331,15 @@ def run_scene(api: mijiaAPI, scene_id: str, scene_mapping: Optional[dict] = None
         print(f"运行场景 {scene_name}({scene_id}) 失败")
         return False
 
-def get(args):
-    api = init_api(args.auth_path)
+def get(args, api: Optional[mijiaAPI] = None):
+    api = api or init_api(args.auth_path)
     device = mijiaDevice(api, did=args.did, dev_name=args.dev_name)
     value = device.get(args.prop_name)
     unit = device.prop_list[args.prop_name].unit
     print(f"{device.name} ({device.did}) 的 {args.prop_name} 值为 {value} {unit if unit else ''}")
 
-def set(args):
-    api = init_api(args.auth_path)
+def set(args, api: Optional[mijiaAPI] = None):
+    api = api or init_api(args.auth_path)
     device = mijiaDevice(api, did=args.did, dev_name=args.dev_name)
     try:
         device.set(args.prop_name, args.value)
@@ -274,22 +349,46 @@ def set(args):
     unit = device.prop_list[args.prop_name].unit
     print(f"{device.name} ({device.did}) 的 {args.prop_name} 值已设置为 {args.value} {unit if unit else ''}")
 
-def main(args):
-    args = parse_args(args)
+def print_stats(metrics: MetricsRegistry, fmt: str = 'text'):
+    if fmt == 'prometheus':
+        print(metrics.to_prometheus(), end='')
+    elif fmt == 'json':
+        print(json.dumps(metrics.snapshot(), indent=2, ensure_ascii=False))
+    else:
+        print("\n请求统计:")
+        print(metrics.summary())
+
+def main(argv):
+    args = parse_args(argv)
+    if args.trace is None:
+        return run(args)
+    with ChromeTraceExporter() as trace:
+        try:
+            with tracer.span("cli", argv=" ".join(argv)):
+                return run(args)
+        finally:
+            trace.save(args.trace)
+            print(f"trace 已保存到 {args.trace}")
 
+def run(args):
     if args.get_device_info:
         device_info = get_device_info(args.get_device_info)
         print(json.dumps(device_info, indent=2, ensure_ascii=False))
-    if not (args.list_devices or
-            args.list_homes or
-            args.list_scenes or
-            args.list_consumable_items or
-            args.run_scene or
-            args.run or
-            hasattr(args, 'func') and args.func is not None):
+    if not has_request_command(args):
         return
 
     api = init_api(args.auth_path)
+    stop_export = api.metrics.export_prometheus(args.metrics_file) if args.metrics_file else None
+    try:
+        run_commands(args, api)
+    finally:
+        if stop_export is not None:
+            stop_export()
+            print(f"请求指标已写入 {args.metrics_file}", file=sys.stderr)
+    if args.stats:
+        print_stats(api.metrics, args.stats_format)
+
+def run_commands(args, api: mijiaAPI):
     device_mapping = None
     home_mapping = None
     scenes_mapping = None
@@ -305,6 +404,14 @@ def main(args):
     if args.run_scene:
         for scene_id in args.run_scene:
             run_scene(api, scene_id, scene_mapping=scenes_mapping)
+    if args.sync_devices:
+        sync_devices(api)
+    if args.warm_spec_cache:
+        result = warm_spec_cache(api)
+        print(f"设备型号 {result['models']} 个，已缓存 {result['cached']} 个，"
+              f"本次获取 {len(result['fetched'])} 个，失败 {len(result['failed'])} 个")
+        for model, error in result['failed'].items():
+            print(f"  - {model}: {error}")
     if args.run:
         if device_mapping is None:
             device_mapping = get_devices_list(api, verbose=False)
@@ -321,9 +428,9 @@ def main(args):
         wifispeaker.run_action('execute-text-directive', _in=[args.run, args.quiet])
     if hasattr(args, 'func') and args.func is not None:
         if args.func == 'get':
-            get(args)
+            get(args, api)
         if args.func == 'set':
-            set(args)
+            set(args, api)
 
 def cli():
     main(sys.argv[1:])
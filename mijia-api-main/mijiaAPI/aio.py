@@ -0,0 +1,312 @@
+import asyncio
+from typing import AsyncIterator, Optional, Union
+
+from .apis import PROP_BATCH_SIZE, mijiaAPI
+from .errors import APIError
+from .logger import logger
+from .miutils import is_gzip
+from .ratelimit import request_dids
+from .statsplan import fetch_rounds
+from .statstore import STATS_MAX_LIMIT
+from .tracing import tracer
+
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - 可选依赖
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    HTTP2_AVAILABLE = False
+
+
+# HTTP/2 禁止携带逐跳首部
+_HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+
+class AsyncMijiaAPI():
+    """
+    基于 asyncio 的米家 API 客户端
+
+    与 mijiaAPI 提供相同的方法（需要 await），签名/加解密与 Token 管理复用同步客户端，
+    网络请求使用 httpx 的连接池（可用时启用 HTTP/2），彼此独立的请求会并发执行。
+
+    需要安装可选依赖: pip install "mijiaAPI[async]"
+
+    示例:
+        >>> async with AsyncMijiaAPI(".mijia-api-data/auth.json") as api:
+        ...     devices = await api.get_devices_list()
+        ...     props = await api.get_devices_prop([...])
+    """
+    def __init__(
+            self,
+            auth_data_path: Optional[str] = None,
+            max_connections: int = 16,
+            http2: bool = True,
+            timeout: float = 30.0,
+            api: Optional[mijiaAPI] = None,
+    ):
+        if httpx is None:
+            raise ImportError("AsyncMijiaAPI 需要安装 httpx，请执行 pip install \"mijiaAPI[async]\"")
+        self.api = api if api is not None else mijiaAPI(auth_data_path)
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(
+            http2=http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # 超出连接池上限的请求排队等待，而不是报错
+            timeout=httpx.Timeout(timeout, pool=None),
+        )
+        self._refresh_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncMijiaAPI":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    @property
+    def available(self) -> bool:
+        return self.api.token_state.usable
+
+    async def login(self) -> dict:
+        return await asyncio.to_thread(self.api.login)
+
+    async def _refresh_token(self, force: bool = False, generation: Optional[int] = None) -> dict:
+        if not force and self.api.token_state.usable:
+            return self.api.auth_data
+        async with self._refresh_lock:
+            # 等锁期间其他协程可能已经完成刷新
+            return await asyncio.to_thread(self.api._refresh_token, force, generation)
+
+    def _headers(self) -> dict:
+        return {k: v for k, v in self.api.session.headers.items() if k.lower() not in _HOP_BY_HOP_HEADERS}
+
+    async def _request(self, uri: str, data: dict, refresh_token: bool = True) -> dict:
+        logger.debug(f"异步请求 URI: {uri}，数据: {data}")
+        with tracer.span("request", uri=uri):
+            if refresh_token:
+                with tracer.span("refresh_check"):
+                    await self._refresh_token()
+            generation = self.api.token_state.generation
+            try:
+                return await self._send_request(uri, data)
+            except APIError as e:
+                if not refresh_token or not self.api.token_state.is_auth_error(e.code):
+                    raise
+                logger.debug(f"Token 已失效 (code: {e.code})，刷新后重试")
+                with tracer.span("refresh_token", code=e.code):
+                    await self._refresh_token(force=True, generation=generation)
+                return await self._send_request(uri, data)
+
+    async def _send_request(self, uri: str, data: dict) -> dict:
+        dids = request_dids(data)
+        # 与同步客户端共用限流预算和请求指标
+        with self.api.metrics.request(uri, dids) as record:
+            with tracer.span("rate_limit"):
+                delay = self.api.rate_limiter.reserve(uri, dids)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            record.mark("wait")
+            url, params, keystream = self.api._prepare_request(uri, data)
+            record.mark("sign")
+            try:
+                with tracer.span("http", uri=uri) as span:
+                    ret = await self.client.post(url, data=params, headers=self._headers())
+                    span.args["status"] = ret.status_code
+            except httpx.TimeoutException:
+                self.api.rate_limiter.record_timeout(uri)
+                record.code = "timeout"
+                raise
+            record.mark("network")
+            record.bytes_sent = len(ret.request.content)
+            record.bytes_received = len(ret.content)
+            return self.api._parse_response(
+                uri, ret.status_code, ret.content, keystream, is_gzip(ret.headers), record)
+
+    async def _request_batched(self, uri: str, params: list, extra: Optional[dict] = None) -> list:
+        extra = extra or {}
+        chunks = [params[i:i + PROP_BATCH_SIZE] for i in range(0, len(params), PROP_BATCH_SIZE)] or [[]]
+        results = await asyncio.gather(*(self._request(uri, {"params": chunk, **extra}) for chunk in chunks))
+        return [item for result in results for item in result]
+
+    async def _get_home_owner(self, home_id: str) -> int:
+        # 与同步客户端共用家庭信息缓存
+        home = self.api._cached_home(home_id)
+        if home is None:
+            await self.get_homes_list()
+            home = self.api._cached_home(home_id)
+        if home is None:
+            raise APIError(-1, f"未找到 home_id={home_id} 的家庭信息")
+        return int(home["uid"])
+
+    async def _iter_home_devices(self, home_id: str) -> AsyncIterator[dict]:
+        uri = "/home/home_device_list"
+        home_owner = await self._get_home_owner(home_id)
+        start_did = ""
+        has_more = True
+        page = 0
+        while has_more:
+            page += 1
+            data = {
+                "home_owner": home_owner,
+                "home_id": int(home_id),
+                "limit": 200,
+                "start_did": start_did,
+                "get_split_device": True,
+                "support_smart_home": True,
+                "get_cariot_device": True,
+                "get_third_device": True
+            }
+            with tracer.span("page", uri=uri, home_id=home_id, page=page):
+                ret = await self._request(uri, data)
+            if ret and ret.get("device_info"):
+                for device in mijiaAPI._add_home_id(ret["device_info"], home_id):
+                    yield device
+                start_did = ret.get("max_did", "")
+                has_more = ret.get("has_more", False) and start_did != ""
+            else:
+                has_more = False
+
+    async def _iter_home_scenes(self, home_id: str) -> AsyncIterator[dict]:
+        uri = "/appgateway/miot/appsceneservice/AppSceneService/GetSimpleSceneList"
+        data = {"app_version": 12, "get_type": 2, "home_id": str(home_id), "owner_uid": await self._get_home_owner(home_id)}
+        ret = await self._request(uri, data)
+        if ret and "manual_scene_info_list" in ret:
+            for scene in mijiaAPI._add_home_id(ret["manual_scene_info_list"], home_id):
+                yield scene
+
+    async def _iter_home_consumables(self, home_id: str) -> AsyncIterator[dict]:
+        uri = "/v2/home/standard_consumable_items"
+        data = {"home_id": int(home_id), "owner_id": await self._get_home_owner(home_id), "filter_ignore": True}
+        for item in mijiaAPI._parse_consumable_items(await self._request(uri, data), home_id):
+            yield item
+
+    async def _iter_homes(self, fetch, home_id: Optional[str]) -> AsyncIterator[dict]:
+        home_ids = [home_id] if home_id is not None else [home["id"] for home in await self.get_homes_list()]
+        for current in home_ids:
+            async for item in fetch(current):
+                yield item
+
+    async def _per_home(self, fetch, home_id: Optional[str]) -> list:
+        # 列表接口：多个家庭并发获取，结果按家庭顺序拼接
+        async def collect(current: str) -> list:
+            return [item async for item in fetch(current)]
+
+        if home_id is not None:
+            return await collect(home_id)
+        home_list = await self.get_homes_list()
+        results = await asyncio.gather(*(collect(home["id"]) for home in home_list))
+        return [item for result in results for item in result]
+
+    def iter_devices(self, home_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """参见 mijiaAPI.iter_devices，使用 async for 逐页获取"""
+        return self._iter_homes(self._iter_home_devices, home_id)
+
+    def iter_scenes(self, home_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """参见 mijiaAPI.iter_scenes，使用 async for 获取"""
+        return self._iter_homes(self._iter_home_scenes, home_id)
+
+    def iter_consumables(self, home_id: Optional[str] = None) -> AsyncIterator[dict]:
+        """参见 mijiaAPI.iter_consumables，使用 async for 获取"""
+        return self._iter_homes(self._iter_home_consumables, home_id)
+
+    async def get_homes_list(self) -> list:
+        """参见 mijiaAPI.get_homes_list"""
+        uri = "/v2/homeroom/gethome_merged"
+        data = {"fg": True, "fetch_share": True, "fetch_share_dev": True, "fetch_cariot": True, "limit": 300, "app_ver": 7, "plat_form": 0}
+        homes = (await self._request(uri, data))["homelist"]
+        self.api._store_homes(homes)
+        return homes
+
+    async def get_devices_list(self, home_id: Optional[str] = None) -> list:
+        """参见 mijiaAPI.get_devices_list，多个家庭并发获取"""
+        return await self._per_home(self._iter_home_devices, home_id)
+
+    async def get_shared_devices_list(self) -> list:
+        """参见 mijiaAPI.get_shared_devices_list"""
+        uri = "/v2/home/device_list_page"
+        data = {"ssid": "<unknown ssid>", "bssid": "02:00:00:00:00:00", "getVirtualModel": True, "getHuamiDevices": 1, "get_split_device": True, "support_smart_home": True, "get_cariot_device": True, "get_third_device": True, "get_phone_device": True, "get_miwear_device": True}
+        ret = await self._request(uri, data)
+        devices = [item for item in ret["list"] if item.get("owner", False)]
+        for device in devices:
+            device.update({"home_id": "shared"})
+        return devices
+
+    async def get_scenes_list(self, home_id: Optional[str] = None) -> list:
+        """参见 mijiaAPI.get_scenes_list，多个家庭并发获取"""
+        return await self._per_home(self._iter_home_scenes, home_id)
+
+    async def run_scene(self, scene_id: str, home_id: str) -> bool:
+        """参见 mijiaAPI.run_scene"""
+        uri = "/appgateway/miot/appsceneservice/AppSceneService/NewRunScene"
+        data = {"scene_id": scene_id, "scene_type": 2, "phone_id": "null", "home_id": str(home_id), "owner_uid": await self._get_home_owner(home_id)}
+        return await self._request(uri, data)
+
+    async def get_consumable_items(self, home_id: Optional[str] = None) -> list:
+        """参见 mijiaAPI.get_consumable_items，多个家庭并发获取"""
+        return await self._per_home(self._iter_home_consumables, home_id)
+
+    async def _cached_request(self, uri: str, params: list, extra: Optional[dict] = None) -> list:
+        try:
+            return await self._request_batched(uri, params, extra)
+        except Exception:
+            self.api.prop_cache.invalidate(params)
+            raise
+
+    async def get_devices_prop(self, data: Union[list, dict], max_age: Optional[float] = None) -> Union[list, dict]:
+        """参见 mijiaAPI.get_devices_prop，超过 PROP_BATCH_SIZE 个属性时拆分后并发请求，与同步客户端共用属性缓存"""
+        params = [data] if isinstance(data, dict) else data
+        cache = self.api.prop_cache
+        hits, missing = cache.lookup(params, max_age) if max_age is not None else ({}, params)
+        fetched = await self._cached_request("/miotspec/prop/get", missing, {"datasource": 1}) if missing or not hits else []
+        cache.store_results(fetched)
+        ret_data = mijiaAPI._merge_cached(params, hits, fetched)
+        if isinstance(data, dict) and len(ret_data) == 1:
+            return ret_data[0]
+        return ret_data
+
+    async def set_devices_prop(self, data: Union[list, dict]) -> Union[list, dict]:
+        """参见 mijiaAPI.set_devices_prop，超过 PROP_BATCH_SIZE 个属性时拆分后并发请求"""
+        params = [data] if isinstance(data, dict) else data
+        ret_data = mijiaAPI._add_result_message(await self._cached_request("/miotspec/prop/set", params))
+        self.api.prop_cache.store_writes(params, ret_data)
+        if isinstance(data, dict) and len(ret_data) == 1:
+            return ret_data[0]
+        return ret_data
+
+    async def run_action(self, data: Union[list, dict]) -> Union[list, dict]:
+        """参见 mijiaAPI.run_action，列表中的每个动作并发执行，结果保持输入顺序"""
+        params = [data] if isinstance(data, dict) else data
+        uri = "/miotspec/action"
+        ret_data = list(await asyncio.gather(*(self._request(uri, {"params": param}) for param in params)))
+        mijiaAPI._add_result_message(ret_data)
+        if isinstance(data, dict) and len(ret_data) == 1:
+            return ret_data[0]
+        return ret_data
+
+    async def get_statistics(self, data: Union[list, dict]) -> list:
+        """参见 mijiaAPI.get_statistics，列表中的每个查询并发执行，结果保持输入顺序"""
+        params = [data] if isinstance(data, dict) else data
+        uri = "/v2/user/statistics"
+        ret_data = list(await asyncio.gather(*(self._request(uri, param) for param in params)))
+        if isinstance(data, dict) and len(ret_data) == 1:
+            return ret_data[0]
+        return ret_data
+
+    async def query_statistics(self, data: Union[list, dict], limit: int = STATS_MAX_LIMIT) -> list:
+        """参见 mijiaAPI.query_statistics，每轮拆分出的请求并发执行"""
+        queries = [data] if isinstance(data, dict) else data
+        rounds = fetch_rounds(queries, limit)
+        try:
+            batch = next(rounds)
+            while True:
+                batch = rounds.send(await self.get_statistics(batch))
+        except StopIteration as e:
+            results = e.value
+        return results[0] if isinstance(data, dict) else results
@@ -1,34 +1,68 @@
 import json
 import locale
+import logging
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 from urllib import parse
 
 import requests
 import tzlocal
 from qrcode import QRCode
+from requests.adapters import HTTPAdapter
 
+from . import fastjson
 from .errors import ERROR_CODE, APIError, LoginError
 from .logger import logger
-from .miutils import (
-    decrypt,
-    gen_nonce,
-    generate_enc_params,
-    get_signed_nonce,
-)
+from .metrics import MetricsRegistry, RequestRecord
+from .miutils import RC4Keystream, RequestSigner, is_gzip
+from .propcache import PropertyCache
+from .ratelimit import RateLimiter, request_dids
+from .registry import DeviceRegistry
+from .statsplan import fetch_rounds
+from .statstore import STATS_MAX_LIMIT
+from .tokens import TokenState
+from .tracing import tracer
+
+
+# 单次 /miotspec/prop/get 和 /miotspec/prop/set 请求携带的最大属性数，超出时自动拆分
+PROP_BATCH_SIZE = 20
+
+# 标记当前线程是否为共享线程池中的工作线程
+_pool_state = threading.local()
 
 
 class mijiaAPI():
-    def __init__(self, auth_data_path: Optional[str] = None):
+    def __init__(
+            self,
+            auth_data_path: Optional[str] = None,
+            token_valid_window: float = 300.0,
+            max_workers: int = 8,
+            home_cache_ttl: float = 300.0,
+            rate_limiter: Optional[RateLimiter] = None,
+    ):
         self.locale = locale.getlocale()[0] if locale.getlocale()[0] else "zh_CN"
         if '_' not in self.locale: # #57, make sure locale is in correct format
             self.locale = "zh_CN"
         self.api_base_url = "https://api.mijia.tech/app"
         self.login_url = "https://account.xiaomi.com/longPolling/loginUrl"
         self.service_login_url = f"https://account.xiaomi.com/pass/serviceLogin?_json=true&sid=mijia&_locale={self.locale}"
+        # 批量接口（run_action、get_statistics）的最大并发请求数，所有调用共享同一个线程池
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # 家庭信息缓存（home_id -> 家庭信息），供需要 owner uid 的按家庭接口复用
+        self.home_cache_ttl = home_cache_ttl
+        self._homes: dict = {}
+        self._homes_loaded_at: Optional[float] = None
+        self._homes_lock = threading.Lock()
+        self._signer: Optional[RequestSigner] = None
+        # 按接口和设备限流，多个 mijiaDevice 共享同一个 mijiaAPI 时共用预算
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
 
         if auth_data_path is None:
             self.auth_data_path = Path.home() / ".config" / "mijia-api" / "auth.json"
@@ -43,9 +77,15 @@ class mijiaAPI():
             self._init_session()
         else:
             self.auth_data = {}
+        self.token_state = TokenState(self.auth_data, valid_window=token_valid_window)
+        # 设备索引，mijiaDevice 等按 did / 名称查找设备时复用
+        self.device_registry = DeviceRegistry(self)
+        self.prop_cache = PropertyCache()
+        self.metrics = MetricsRegistry()
 
     def _init_session(self):
         self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max(10, self.max_workers)))
         self.session.headers.update({
             "User-Agent": self.user_agent,
             "accept-encoding": "identity",
@@ -68,13 +108,14 @@ class mijiaAPI():
 
     @property
     def available(self) -> bool:
-        if not self.auth_data:
-            return False
-        if any(key not in self.auth_data for key in ["ua", "ssecurity", "userId", "cUserId", "serviceToken"]):
+        if not self.token_state.has_credentials:
             return False
+        if self.token_state.is_fresh():
+            return True
         try:
             self.check_new_msg(refresh_token=False)
         except Exception:
+            self.token_state.invalidate()
             return False
         return True
 
@@ -140,6 +181,10 @@ class mijiaAPI():
         logger.debug(f"认证数据: {self.auth_data}")
 
     def _get_location(self) -> dict:
+        with tracer.span("get_location"):
+            return self._fetch_location()
+
+    def _fetch_location(self) -> dict:
         headers = {
             "User-Agent": self.user_agent,
             "Connection": "keep-alive",
@@ -165,18 +210,28 @@ class mijiaAPI():
         location_data = parse.parse_qs(parse.urlparse(location).query)
         return {k: v[0] for k, v in location_data.items()}
 
-    def _refresh_token(self) -> dict:
-        if self.available:
+    def _refresh_token(self, force: bool = False, generation: Optional[int] = None) -> dict:
+        if not force and self.token_state.usable:
+            # 本地判断 Token 未过期时直接使用，若服务器返回鉴权错误再由 _request 强制刷新
             logger.debug("Token 有效，无需刷新")
             return self.auth_data
-        location_data = self._get_location()
-        if location_data.get("code", -1) == 0 and location_data.get("message", "") == "刷新Token成功":
-            self._save_auth_data()
-            self._init_session()
-            logger.debug("刷新Token成功")
-            return self.auth_data
-        else:
-            raise LoginError(-1, "刷新Token失败，请重新登录")
+        with self.token_state.lock:
+            if generation is not None and generation != self.token_state.generation:
+                logger.debug("Token 已被其他请求刷新")
+                return self.auth_data
+            if not force and self.token_state.usable:
+                return self.auth_data
+            self.token_state.invalidate()
+            location_data = self._get_location()
+            if location_data.get("code", -1) == 0 and location_data.get("message", "") == "刷新Token成功":
+                self.auth_data["expireTime"] = int((datetime.now() + timedelta(days=30)).timestamp() * 1000)
+                self._save_auth_data()
+                self._init_session()
+                self.token_state.mark_refreshed()
+                logger.debug("刷新Token成功")
+                return self.auth_data
+            else:
+                raise LoginError(-1, "刷新Token失败，请重新登录")
 
     def login(self, *args, **kwargs) -> dict:
         """
@@ -267,22 +322,154 @@ class mijiaAPI():
 
     def _request(self, uri: str, data: dict, refresh_token: bool = True) -> dict:
         logger.debug(f"请求 URI: {uri}，数据: {data}")
-        if refresh_token:
-            self._refresh_token()
-        url = self.api_base_url + uri
-        params = { "data": json.dumps(data, separators=(',', ':')) }
-        nonce = gen_nonce()
-        signed_nonce = get_signed_nonce(self.auth_data["ssecurity"], nonce)
-        params = generate_enc_params(uri, "POST", signed_nonce, nonce, params, self.auth_data["ssecurity"])
-        ret = self.session.post(url, data=params)
+        with tracer.span("request", uri=uri):
+            if refresh_token:
+                with tracer.span("refresh_check"):
+                    self._refresh_token()
+            generation = self.token_state.generation
+            try:
+                return self._send_request(uri, data)
+            except APIError as e:
+                if not refresh_token or not self.token_state.is_auth_error(e.code):
+                    raise
+                logger.debug(f"Token 已失效 (code: {e.code})，刷新后重试")
+                with tracer.span("refresh_token", code=e.code):
+                    self._refresh_token(force=True, generation=generation)
+                return self._send_request(uri, data)
+
+    def _request_batched(self, uri: str, params: list, extra: Optional[dict] = None) -> list:
+        """按 PROP_BATCH_SIZE 拆分 params 列表，并发请求后按原顺序拼接结果"""
+        extra = extra or {}
+        chunks = [params[i:i + PROP_BATCH_SIZE] for i in range(0, len(params), PROP_BATCH_SIZE)] or [[]]
+        results = self._request_many(uri, [{"params": chunk, **extra} for chunk in chunks])
+        return [item for result in results for item in result]
+
+    def _cached_request(self, uri: str, params: list, extra: Optional[dict] = None) -> list:
+        """属性读写请求失败时，使涉及的属性缓存失效"""
         try:
-            ret_data = json.loads(ret.text)
-        except json.JSONDecodeError:
-            dec_data = decrypt(self.auth_data["ssecurity"], nonce, ret.text)
-            ret_data = json.loads(dec_data)
-        logger.debug(f"响应数据: {ret_data}")
+            return self._request_batched(uri, params, extra)
+        except Exception:
+            self.prop_cache.invalidate(params)
+            raise
+
+    @staticmethod
+    def _merge_cached(params: list, hits: dict, fetched: list) -> list:
+        """按请求顺序合并缓存命中的结果与服务器返回的结果"""
+        if not hits:
+            return fetched
+        fetched_map = {(str(ret.get("did")), ret.get("siid"), ret.get("piid")): ret for ret in fetched}
+        ret_data = []
+        for index, item in enumerate(params):
+            if index in hits:
+                ret_data.append(hits[index])
+            else:
+                key = (str(item.get("did")), item.get("siid"), item.get("piid"))
+                ret_data.append(fetched_map.get(key, {**item, "code": -1}))
+        return ret_data
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mijiaAPI")
+            return self._executor
+
+    def _request_many(self, uri: str, payloads: list, max_workers: Optional[int] = None) -> list:
+        """
+        并发发送同一接口的多个请求，结果保持输入顺序，任一请求抛出的异常按输入顺序向上传递
+
+        所有调用共享实例上最多 self.max_workers 个线程的线程池，max_workers 只进一步限制本次调用
+        同时占用的线程数；在线程池内部发起的嵌套调用直接在当前线程顺序执行，避免互相等待。
+        """
+        workers = min(max_workers or self.max_workers, self.max_workers, len(payloads))
+        if workers <= 1 or getattr(_pool_state, "active", False):
+            return [self._request(uri, payload) for payload in payloads]
+
+        slots = threading.Semaphore(workers)
+
+        def task(payload):
+            _pool_state.active = True
+            try:
+                return self._request(uri, payload)
+            finally:
+                _pool_state.active = False
+                slots.release()
+
+        executor = self._get_executor()
+        futures = []
+        for payload in payloads:
+            slots.acquire()
+            futures.append(executor.submit(task, payload))
+        return [future.result() for future in futures]
+
+    def _send_request(self, uri: str, data: dict) -> dict:
+        dids = request_dids(data)
+        with self.metrics.request(uri, dids) as record:
+            with tracer.span("rate_limit"):
+                self.rate_limiter.acquire(uri, dids)
+            record.mark("wait")
+            url, params, keystream = self._prepare_request(uri, data)
+            record.mark("sign")
+            try:
+                with tracer.span("http", uri=uri) as span:
+                    ret = self.session.post(url, data=params)
+                    span.args["status"] = ret.status_code
+            except requests.exceptions.Timeout:
+                self.rate_limiter.record_timeout(uri)
+                record.code = "timeout"
+                raise
+            record.mark("network")
+            record.bytes_sent = len(ret.request.body or "")
+            record.bytes_received = len(ret.content)
+            return self._parse_response(uri, ret.status_code, ret.content, keystream, is_gzip(ret.headers), record)
+
+    @property
+    def signer(self) -> RequestSigner:
+        """当前 ssecurity 对应的签名器，刷新 Token 后 ssecurity 变化时重新创建"""
+        signer = self._signer
+        if signer is None or signer.ssecurity != self.auth_data["ssecurity"]:
+            signer = self._signer = RequestSigner(self.auth_data["ssecurity"])
+        return signer
+
+    def _prepare_request(self, uri: str, data: dict) -> tuple:
+        """签名并加密请求参数，返回 (url, params, keystream)，同步与异步客户端共用"""
+        with tracer.span("sign", uri=uri):
+            url = self.api_base_url + uri
+            params = { "data": fastjson.dumps(data) }
+            params, keystream = self.signer.sign(uri, "POST", params)
+        return url, params, keystream
+
+    def _parse_response(
+            self,
+            uri: str,
+            status_code: int,
+            body: Union[bytes, str],
+            keystream: RC4Keystream,
+            gzip: bool = False,
+            record: Optional[RequestRecord] = None,
+    ) -> dict:
+        """
+        解密并校验响应，返回 result 字段，同步与异步客户端共用
+
+        响应体按明文、RC4 或 RC4+gzip 一次解码（参见 RC4Keystream.decode_response），
+        安装了 orjson/ujson 时使用其解析 JSON。传入 record 时记录解密和解析阶段的耗时。
+        """
+        if status_code in (401, 403):
+            raise APIError(status_code, body.decode('utf-8', 'replace') if isinstance(body, bytes) else body)
+        with tracer.span("decrypt", size=len(body)):
+            decoded = keystream.decode_response(body, gzip)
+        if record is not None:
+            record.mark("decrypt")
+        with tracer.span("parse", size=len(decoded)):
+            ret_data = fastjson.loads(decoded)
+        if record is not None:
+            record.mark("parse")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"响应数据: {ret_data}")
         if ret_data.get("code", 0) != 0 or "result" not in ret_data:
+            self.rate_limiter.record(uri, ret_data.get("code"))
             raise APIError(ret_data["code"], ret_data.get("message", ret_data.get("desc", "未知错误")))
+        self.token_state.mark_valid()
+        self.rate_limiter.record_result(uri, ret_data["result"])
         return ret_data["result"]
 
     @staticmethod
@@ -296,22 +483,55 @@ class mijiaAPI():
             return data
         return data
 
+    @staticmethod
+    def _add_result_message(ret_data: list) -> list:
+        for ret in ret_data:
+            if ret.get("code", 0) != 0:
+                ret.update({"message": ERROR_CODE.get(str(ret["code"]), "未知错误")})
+            else:
+                ret.update({"message": "成功"})
+        return ret_data
+
+
+    def _store_homes(self, homes: list):
+        with self._homes_lock:
+            self._homes = {str(home["id"]): home for home in homes}
+            self._homes_loaded_at = time.monotonic()
+
+    def _cached_home(self, home_id: str) -> Optional[dict]:
+        """从缓存获取家庭信息，缓存过期或不存在时返回 None，不发起网络请求"""
+        with self._homes_lock:
+            if self._homes_loaded_at is None or time.monotonic() - self._homes_loaded_at >= self.home_cache_ttl:
+                return None
+            return self._homes.get(str(home_id))
+
+    def invalidate_home_cache(self):
+        """清空家庭信息缓存，下次需要时重新获取"""
+        with self._homes_lock:
+            self._homes_loaded_at = None
+
+    def _get_home(self, home_id: str) -> dict:
+        home = self._cached_home(home_id)
+        if home is None:
+            self.get_homes_list()
+            home = self._cached_home(home_id)
+        if home is None:
+            raise APIError(-1, f"未找到 home_id={home_id} 的家庭信息")
+        return home
 
     def _get_home_owner(self, home_id: str) -> int:
-        homes = self.get_homes_list()
-        for home in homes:
-            if home["id"] == home_id:
-                return int(home["uid"])
-        raise APIError(-1, f"未找到 home_id={home_id} 的家庭信息")
+        return int(self._get_home(home_id)["uid"])
 
-    def _get_devices_list(self, home_id: str) -> list:
+    def _iter_home_devices(self, home_id: str) -> Iterator[dict]:
         uri = "/home/home_device_list"
+        home_owner = self._get_home_owner(home_id)
         start_did = ""
         has_more = True
-        devices = []
+        page = 0
         while has_more:
+            page += 1
             data = {
-                "home_owner": self._get_home_owner(home_id),
+                "home_owner": home_owner,
                 "home_id": int(home_id),
                 "limit": 200,
                 "start_did": start_did,
@@ -320,37 +540,86 @@ class mijiaAPI():
                 "get_cariot_device": True,
                 "get_third_device": True
             }
-            ret = self._request(uri, data)
+            with tracer.span("page", uri=uri, home_id=home_id, page=page):
+                ret = self._request(uri, data)
             if ret and ret.get("device_info"):
-                devices.extend(ret["device_info"])
+                yield from self._add_home_id(ret["device_info"], home_id)
                 start_did = ret.get("max_did", "")
                 has_more = ret.get("has_more", False) and start_did != ""
             else:
                 has_more = False
-        return self._add_home_id(devices, home_id)
 
-    def _get_scenes_list(self, home_id: str) -> list:
+    def _iter_home_scenes(self, home_id: str) -> Iterator[dict]:
         uri = "/appgateway/miot/appsceneservice/AppSceneService/GetSimpleSceneList"
         data = {"app_version": 12, "get_type": 2, "home_id": str(home_id), "owner_uid": self._get_home_owner(home_id)}
         ret = self._request(uri, data)
         if ret and "manual_scene_info_list" in ret:
-            scenes = ret["manual_scene_info_list"]
-            return self._add_home_id(scenes, home_id)
-        return []
+            yield from self._add_home_id(ret["manual_scene_info_list"], home_id)
 
-    def _get_consumable_items(self, home_id: str) -> list:
+    def _iter_home_consumables(self, home_id: str) -> Iterator[dict]:
         uri = "/v2/home/standard_consumable_items"
         data = {"home_id": int(home_id), "owner_id": self._get_home_owner(home_id), "filter_ignore": True}
-        ret = self._request(uri, data)
+        yield from self._parse_consumable_items(self._request(uri, data), home_id)
+
+    @classmethod
+    def _parse_consumable_items(cls, ret: dict, home_id: str) -> list:
         try:
             items = ret["items"][0]["consumes_data"]
-            for item in items:
-                if isinstance(item.get("details"), list) and len(item["details"]) == 1:
-                    item["details"] = item["details"][0]
-            return self._add_home_id(items, home_id)
-        except (KeyError, IndexError):
+        except (KeyError, IndexError, TypeError):
             return []
+        for item in items:
+            if isinstance(item.get("details"), list) and len(item["details"]) == 1:
+                item["details"] = item["details"][0]
+        return cls._add_home_id(items, home_id)
+
+    def _iter_homes(self, fetch, home_id: Optional[str]) -> Iterator[dict]:
+        if home_id is not None:
+            yield from fetch(home_id)
+            return
+        for home in self.get_homes_list():
+            yield from fetch(home["id"])
+
+    def iter_devices(self, home_id: Optional[str] = None) -> Iterator[dict]:
+        """
+        逐页获取设备
 
+        与 get_devices_list 相同，但以生成器的形式按页返回设备，
+        每收到一页即可开始处理，无需等待所有家庭、所有分页下载完成。
+
+        参数:
+            home_id (Optional[str]): 可选，家庭ID，为 None 时依次获取所有家庭中的设备
+
+        返回值:
+            Iterator[dict]: 设备信息，已包含 home_id 字段，字段同 get_devices_list
+
+        异常:
+            APIError: 当API请求失败或返回错误时抛出
+        """
+        return self._iter_homes(self._iter_home_devices, home_id)
+
+    def iter_scenes(self, home_id: Optional[str] = None) -> Iterator[dict]:
+        """
+        逐个家庭获取场景
+
+        参数:
+            home_id (Optional[str]): 可选，家庭ID，为 None 时依次获取所有家庭中的场景
+
+        返回值:
+            Iterator[dict]: 场景信息，已包含 home_id 字段，字段同 get_scenes_list
+        """
+        return self._iter_homes(self._iter_home_scenes, home_id)
+
+    def iter_consumables(self, home_id: Optional[str] = None) -> Iterator[dict]:
+        """
+        逐个家庭获取耗材
+
+        参数:
+            home_id (Optional[str]): 可选，家庭ID，为 None 时依次获取所有家庭中的耗材
+
+        返回值:
+            Iterator[dict]: 耗材信息，已包含 home_id 字段，字段同 get_consumable_items
+        """
+        return self._iter_homes(self._iter_home_consumables, home_id)
 
     def check_new_msg(self, begin_at: int = int(time.time()) - 3600, refresh_token: bool = True) -> dict:
         uri = "/v2/message/v2/check_new_msg"
@@ -362,6 +631,8 @@ class mijiaAPI():
         获取用户的所有家庭列表
 
         包括自己创建的家庭和被共享的家庭。
+        每次调用都会请求服务器，并用结果更新家庭信息缓存，
+        之后按家庭获取设备、场景、耗材时复用缓存中的 owner uid。
 
         参数:
             无
@@ -379,7 +650,9 @@ class mijiaAPI():
         """
         uri = "/v2/homeroom/gethome_merged"
         data = {"fg": True, "fetch_share": True, "fetch_share_dev": True, "fetch_cariot": True, "limit": 300, "app_ver": 7, "plat_form": 0}
-        return self._request(uri, data)["homelist"]
+        homes = self._request(uri, data)["homelist"]
+        self._store_homes(homes)
+        return homes
 
     def get_devices_list(self, home_id: Optional[str] = None) -> list:
         """
@@ -404,14 +677,7 @@ class mijiaAPI():
         异常:
             APIError: 当API请求失败或返回错误时抛出
         """
-        if home_id is None:
-            home_list = self.get_homes_list()
-            devices = []
-            for home in home_list:
-                devices.extend(self._get_devices_list(home["id"]))
-            return devices
-        else:
-            return self._get_devices_list(home_id)
+        return list(self.iter_devices(home_id))
 
     def get_shared_devices_list(self) -> list:
         """
@@ -461,14 +727,7 @@ class mijiaAPI():
         异常:
             APIError: 当API请求失败或返回错误时抛出
         """
-        if home_id is None:
-            home_list = self.get_homes_list()
-            scenes = []
-            for home in home_list:
-                scenes.extend(self._get_scenes_list(home["id"]))
-            return scenes
-        else:
-            return self._get_scenes_list(home_id)
+        return list(self.iter_scenes(home_id))
 
     def run_scene(self, scene_id: str, home_id: str) -> bool:
         """
@@ -520,21 +779,15 @@ class mijiaAPI():
         异常:
             APIError: 当API请求失败或返回错误时抛出
         """
-        if home_id is None:
-            home_list = self.get_homes_list()
-            items = []
-            for home in home_list:
-                items.extend(self._get_consumable_items(home["id"]))
-            return items
-        else:
-            return self._get_consumable_items(home_id)
+        return list(self.iter_consumables(home_id))
 
-    def get_devices_prop(self, data: Union[list, dict]) -> Union[list, dict]:
+    def get_devices_prop(self, data: Union[list, dict], max_age: Optional[float] = None) -> Union[list, dict]:
         """
         获取设备属性
 
         获取一个或多个设备的属性值，例如灯的亮度、色温、开关状态等。
-        支持批量获取多个设备的多个属性。
+        支持批量获取多个设备的多个属性，超过 PROP_BATCH_SIZE 个属性时自动拆分为多个请求并发发送。
+        读取和写入成功的值会记录在 prop_cache 中，指定 max_age 时优先使用足够新的缓存。
 
         参数:
             data (Union[list, dict]): 设备属性查询参数
@@ -547,6 +800,9 @@ class mijiaAPI():
                               model 从 get_devices_list() 获取
                 - piid (int): 属性ID，从 https://home.miot-spec.com/spec/{model} 获取，
                               model 从 get_devices_list() 获取
+            max_age (Optional[float]): 可选，可接受的缓存时间（秒）。
+                - 如果为 None，则总是请求服务器
+                - 如果指定，则不超过 max_age 秒（且未超过属性自身有效期）的缓存值直接返回，只请求其余属性
 
         返回值:
             Union[list, dict]: 设备属性查询结果
@@ -557,7 +813,7 @@ class mijiaAPI():
                 - did (str): 设备ID
                 - siid (int): 服务ID
                 - piid (int): 属性ID
-                - value: 属性值，数据类型根据属性定义而定
+                - value: 属性值，数据类型根据属性定义而定（失败时无此字段）
                 - code (int): 错误代码，0 表示成功
                 - updateTime (int): 属性最后更新时间的时间戳（秒）
                 - ...
@@ -586,7 +842,10 @@ class mijiaAPI():
         else:
             params = data
         uri = "/miotspec/prop/get"
-        ret_data = self._request(uri, {"params": params, "datasource": 1})
+        hits, missing = self.prop_cache.lookup(params, max_age) if max_age is not None else ({}, params)
+        fetched = self._cached_request(uri, missing, {"datasource": 1}) if missing or not hits else []
+        self.prop_cache.store_results(fetched)
+        ret_data = self._merge_cached(params, hits, fetched)
         if isinstance(data, dict) and len(ret_data) == 1:
             return ret_data[0]
         return ret_data
@@ -596,7 +855,7 @@ class mijiaAPI():
         设置设备属性
 
         设置一个或多个设备的属性值，例如灯的亮度、色温等。
-        支持批量设置多个设备的多个属性。
+        支持批量设置多个设备的多个属性，超过 PROP_BATCH_SIZE 个属性时自动拆分为多个请求并发发送。
 
         参数:
             data (Union[list, dict]): 设备属性参数
@@ -649,22 +908,48 @@ class mijiaAPI():
         else:
             params = data
         uri = "/miotspec/prop/set"
-        ret_data = self._request(uri, {"params": params})
-        for ret in ret_data:
-            if ret.get("code", 0) != 0:
-                ret.update({"message": ERROR_CODE.get(str(ret["code"]), "未知错误")})
-            else:
-                ret.update({"message": "成功"})
+        ret_data = self._add_result_message(self._cached_request(uri, params))
+        self.prop_cache.store_writes(params, ret_data)
         if isinstance(data, dict) and len(ret_data) == 1:
             return ret_data[0]
         return ret_data
 
-    def run_action(self, data: Union[list, dict]) -> Union[list, dict]:
+    def set_devices_prop_batch(self, writes: dict) -> dict:
+        """
+        按设备批量设置属性
+
+        将多个设备的属性写入合并为尽可能少的 /miotspec/prop/set 请求，并按设备返回结果。
+
+        参数:
+            writes (dict): 设备ID -> 该设备的属性列表，列表中每个元素包含 siid、piid、value
+
+        返回值:
+            dict: 设备ID -> 设置结果列表（顺序与输入一致），每个结果包含 siid、piid、code、message 等字段
+
+        示例:
+            >>> result = api.set_devices_prop_batch({
+            ...     "1234567890": [{"siid": 2, "piid": 2, "value": 40}, {"siid": 2, "piid": 3, "value": 3000}],
+            ...     "0987654321": [{"siid": 2, "piid": 1, "value": False}],
+            ... })
+        """
+        params = [{**prop, "did": str(did)} for did, props in writes.items() for prop in props]
+        if not params:
+            return {}
+        ret_data = self.set_devices_prop(params)
+        # 服务器返回的 did 为字符串，按 str(did) 对应回调用方传入的键（可能是 int）
+        grouped = {did: [] for did in writes}
+        keys = {str(did): did for did in writes}
+        for ret in ret_data:
+            did = str(ret.get("did"))
+            grouped.setdefault(keys.get(did, did), []).append(ret)
+        return grouped
+
+    def run_action(self, data: Union[list, dict], max_workers: Optional[int] = None) -> Union[list, dict]:
         """
         执行设备操作
 
         执行一个或多个设备的操作/方法，例如开关灯、喂食等。
-        支持批量执行多个设备的多个操作。
+        支持批量执行多个设备的多个操作，服务器每次请求只接受一个操作，批量操作会并发发送。
 
         参数:
             data (Union[list, dict]): 设备操作参数
@@ -678,11 +963,12 @@ class mijiaAPI():
                 - aiid (int): 操作/方法ID，从 https://home.miot-spec.com/spec/{model} 获取，
                               model 从 get_devices_list() 获取
                 - value (list): 可选，操作的参数列表，根据具体操作定义而定
+            max_workers (Optional[int]): 可选，本次调用的最大并发请求数，默认且最多为初始化时的 max_workers（实例共享的线程池大小）
 
         返回值:
             Union[list, dict]: 操作结果
                 - 如果输入为 dict，返回单个设备的操作结果 dict
-                - 如果输入为 list，返回操作结果列表
+                - 如果输入为 list，返回操作结果列表，顺序与输入一致
 
                 返回的 dict 包含以下字段：
                 - did (str): 设备ID
@@ -722,27 +1008,21 @@ class mijiaAPI():
         else:
             params = data
         uri = "/miotspec/action"
-        ret_data = []
-        for param in params:
-            ret = self._request(uri, {"params": param})
-            ret_data.append(ret)
-        for ret in ret_data:
-            if ret.get("code", 0) != 0:
-                ret.update({"message": ERROR_CODE.get(str(ret["code"]), "未知错误")})
-            else:
-                ret.update({"message": "成功"})
+        ret_data = self._request_many(uri, [{"params": param} for param in params], max_workers=max_workers)
+        self._add_result_message(ret_data)
         if isinstance(data, dict) and len(ret_data) == 1:
             return ret_data[0]
         return ret_data
 
-    def get_statistics(self, data: dict) -> list:
+    def get_statistics(self, data: Union[list, dict], max_workers: Optional[int] = None) -> list:
         """
         获取设备统计数据。
 
         获取指定设备的统计信息，如耗电量、使用时长等。支持按小时、天、周、月等不同粒度统计。
+        传入查询参数列表时，多个查询会并发发送，结果顺序与输入一致。
 
         参数：
-            data (dict): 统计查询参数，包含以下字段：
+            data (Union[list, dict]): 统计查询参数（或其列表），包含以下字段：
                 - did (str): 设备ID
                 - key (str): 统计数据的键，格式为 siid.piid（服务ID.属性ID），
                   例如 "7.1" 表示 lumi.acpartner.mcn04 (米家空调伴侣Pro 万能遥控版) 的 power-consumption
@@ -755,10 +1035,11 @@ class mijiaAPI():
                 - limit (int): 返回的最大条目数
                 - time_start (int): 开始时间戳（秒）
                 - time_end (int): 结束时间戳（秒）
+            max_workers (Optional[int]): 可选，本次调用的最大并发请求数，默认且最多为初始化时的 max_workers（实例共享的线程池大小）
 
         返回值：
             list: 统计数据列表，每项包含以下字段：
-                - value (str): 统计值（通常需要用 eval() 解析）
+                - value (str): 统计值，形如 "[12.5]"，可用 parse_stat_value() 或 decode_statistics() 解析
                 - time (int): 时间戳
 
         已知问题：
@@ -784,8 +1065,9 @@ class mijiaAPI():
             ...     "time_start": int(time.time() - 24 * 3600 * 30 * 6),
             ...     "time_end": int(time.time()),
             ... })
+            >>> from mijiaAPI.statstore import parse_stat_value
             >>> for item in ret:
-            ...     value = eval(item['value'])[0]
+            ...     value = parse_stat_value(item['value'])
             ...     ts = item['time']
             ...     date = time.strftime('%Y-%m-%d', time.localtime(ts))
             ...     print(f'{date}: {value}')
@@ -795,10 +1077,54 @@ class mijiaAPI():
         else:
             params = data
         uri = "/v2/user/statistics"
-        ret_data = []
-        for param in params:
-            ret = self._request(uri, param)
-            ret_data.append(ret)
+        ret_data = self._request_many(uri, params, max_workers=max_workers)
         if isinstance(data, dict) and len(ret_data) == 1:
             return ret_data[0]
         return ret_data
+
+    def query_statistics(
+            self,
+            data: Union[list, dict],
+            max_workers: Optional[int] = None,
+            limit: int = STATS_MAX_LIMIT,
+    ) -> list:
+        """
+        按所需分辨率查询任意长度时间段的统计数据
+
+        自动选择满足分辨率的最粗统计粒度，将时间段拆分为最少的请求（每个请求不超过服务端的条目上限），
+        所有查询的请求合并为一次并发的 get_statistics 调用；结果被截断的请求会拆分后重新获取，
+        最后按时间拼接，不重复也不遗漏。
+
+        参数:
+            data (Union[list, dict]): 查询参数，可以是单个字典或字典列表，每个字典包含：
+                - did (str): 设备ID
+                - key (str): 统计数据的键，参见 get_statistics
+                - time_start (int): 开始时间戳（秒）
+                - time_end (int): 结束时间戳（秒）
+                - resolution (Union[str, int]): 可选，所需分辨率，hour、day、week、month 或秒数，默认 day
+                - data_type (str): 可选，直接指定统计类型，指定后忽略 resolution
+                - v3 (bool): 可选，是否使用 _v3 接口，较旧的设备需要设为 False，默认 True
+            max_workers (Optional[int]): 可选，最大并发请求数
+            limit (int): 单次请求的最大条目数，默认为服务端上限 1000
+
+        返回值:
+            list: 单个查询时为按时间升序的统计数据列表（格式同 get_statistics），多个查询时为对应的列表的列表
+
+        示例:
+            >>> ret = api.query_statistics({
+            ...     "did": "123456",
+            ...     "key": "7.1",
+            ...     "resolution": "day",
+            ...     "time_start": int(time.time() - 24 * 3600 * 365 * 5),
+            ...     "time_end": int(time.time()),
+            ... })
+        """
+        queries = [data] if isinstance(data, dict) else data
+        rounds = fetch_rounds(queries, limit)
+        try:
+            batch = next(rounds)
+            while True:
+                batch = rounds.send(self.get_statistics(batch, max_workers=max_workers))
+        except StopIteration as e:
+            results = e.value
+        return results[0] if isinstance(data, dict) else results
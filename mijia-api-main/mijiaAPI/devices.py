@@ -1,7 +1,12 @@
+import html
 import json
 import re
+import threading
 import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional, Union
 
 import requests
@@ -10,35 +15,141 @@ from .apis import mijiaAPI
 from .errors import (
     DeviceActionError,
     DeviceGetError,
-    DeviceNotFoundError,
     DeviceSetError,
     GetDeviceInfoError,
-    MultipleDevicesFoundError,
 )
 from .logger import logger
+from .propcache import property_ttl
+from .specstore import open_spec_store
+from .tracing import tracer
 from .version import version
 
 
 device_url = "https://home.miot-spec.com/spec/"
+data_page_pattern = re.compile(r'data-page="([^"]*)"')
 
+# 规格缓存的默认最长有效期（秒），超过后在后台重新校验
+SPEC_MAX_AGE = 7 * 24 * 3600
+# 后台校验失败后，同一型号再次尝试前的最短间隔（秒）
+SPEC_RETRY_INTERVAL = 300
+
+_revalidating: dict = {}
+_revalidating_lock = threading.Lock()
+
+
+def _normalize_name(name: str) -> str:
+    """属性/动作名称中的 '-' 与 '_' 视为等价，便于以 Python 属性的形式访问"""
+    return name.replace("_", "-")
+
+
+def _freeze(value):
+    """将规格中的 dict/list 转换为只读的 MappingProxyType/tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class _Frozen():
+    """只读对象基类，字段只能在 __init__ 中通过 _init 设置"""
+    __slots__ = ()
+
+    def _init(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+
+_BOOL_STRINGS = {"true": True, "false": False, "0": False, "1": True}
+
+
+def _coerce_bool(value) -> bool:
+    if isinstance(value, str):
+        result = _BOOL_STRINGS.get(value.lower())
+        if result is None:
+            raise ValueError(f"无效布尔值: {value}")
+        return result
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise ValueError(f"无效布尔值: {value}")
+
+
+def _coerce_string(value) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"无效字符串值: {value}")
+    return value
+
+
+_COERCERS = {"bool": _coerce_bool, "int": int, "uint": int, "float": float, "string": _coerce_string}
+
+
+def _compile_validator(prop_type: str, value_range, value_list):
+    """
+    根据属性定义生成校验函数
+
+    取值范围、步长和枚举值集合在编译时计算好，返回的函数只做必要的比较，
+    校验通过时返回转换后的值，否则抛出 ValueError。
+    """
+    coerce = _COERCERS[prop_type]
+    lo = hi = step = None
+    if value_range and prop_type in ("int", "uint", "float"):
+        lo, hi = value_range[0], value_range[1]
+        bounds = list(value_range[:2])
+        if len(value_range) >= 3:
+            step = value_range[2]
+            # 与规格平台保持一致：整数步长为 1 时不检查，浮点数只检查整数步长
+            if prop_type == "float" and not isinstance(step, int):
+                step = None
+            elif prop_type != "float" and step == 1:
+                step = None
+    allowed = None
+    if value_list:
+        allowed = frozenset(item["value"] for item in value_list)
+        allowed_text = [dict(item) for item in value_list]
+    is_float = prop_type == "float"
+
+    def check(value):
+        value = coerce(value)
+        if lo is not None:
+            if value < lo or value > hi:
+                raise ValueError(f"{value} 超出数值范围, 应该在 {bounds} 之间")
+            if step is not None and (int(value - lo) if is_float else value - lo) % step != 0:
+                raise ValueError(f"无效的值: {value}, 应该在范围 {bounds} 内且步长为 {step}")
+        if allowed is not None and value not in allowed:
+            raise ValueError(f"无效值: {value}, 请使用 {allowed_text}")
+        return value
+
+    return check
+
+
+class DevProp(_Frozen):
+    __slots__ = ("name", "desc", "type", "rw", "unit", "range", "value_list", "method", "check")
 
-class DevProp():
     def __init__(self, prop_dict: dict):
-        self.name = prop_dict["name"]
-        self.desc = prop_dict["description"]
-        self.type = prop_dict["type"]
-        if self.type not in ["bool", "int", "uint", "float", "string"]:
-            raise ValueError(f"不支持的类型: {self.type}, 可选类型: bool, int, uint, float, string")
-        self.rw = prop_dict["rw"]
-        self.unit = prop_dict["unit"]
-        self.range = prop_dict["range"]
-        self.value_list = prop_dict.get("value-list", None)
-        self.method = prop_dict["method"]
+        if prop_dict["type"] not in ["bool", "int", "uint", "float", "string"]:
+            raise ValueError(f"不支持的类型: {prop_dict['type']}, 可选类型: bool, int, uint, float, string")
+        self._init(
+            name=prop_dict["name"],
+            desc=prop_dict["description"],
+            type=prop_dict["type"],
+            rw=prop_dict["rw"],
+            unit=prop_dict["unit"],
+            range=_freeze(prop_dict["range"]),
+            value_list=_freeze(prop_dict.get("value-list", None)),
+            method=_freeze(prop_dict["method"]),
+        )
+        self._init(check=_compile_validator(self.type, self.range, self.value_list))
 
     def __str__(self):
         lines = [
             f"  {self.name}: {self.desc}",
-            f"    valuetype: {self.type}, rw: {self.rw}, unit: {self.unit}, range: {self.range}"
+            f"    valuetype: {self.type}, rw: {self.rw}, unit: {self.unit}, range: {list(self.range) if self.range else self.range}"
         ]
 
         if self.value_list:
@@ -48,23 +159,158 @@ class DevProp():
         return "\n".join(lines)
 
 
-class DevAction():
+class DevAction(_Frozen):
+    __slots__ = ("name", "desc", "method")
+
     def __init__(self, act_dict: dict):
-        self.name = act_dict["name"]
-        self.desc = act_dict["description"]
-        self.method = act_dict["method"]
+        self._init(
+            name=act_dict["name"],
+            desc=act_dict["description"],
+            method=_freeze(act_dict["method"]),
+        )
 
     def __str__(self):
         return f"  {self.name}: {self.desc}"
 
 
+# 规范化名称对应多个原始名称时的占位，此时只能使用原始名称查找
+_AMBIGUOUS = object()
+
+
+class SpecIndex(Mapping):
+    """
+    属性/动作名称索引
+
+    按规格中的原始名称精确查找；原始名称不存在时再按规范化名称（'_' 替换为 '-'）查找，
+    'color-temperature' 与 'color_temperature' 等价。规格中同时存在 'a-b' 与 'a_b' 时
+    规范化名称有歧义，两者都只能使用原始名称访问。遍历时只返回规格中的原始名称。
+    """
+    __slots__ = ("_exact", "_normalized")
+
+    def __init__(self, items):
+        exact = {}
+        normalized = {}
+        for item in items:
+            if item.name in exact:
+                continue
+            exact[item.name] = item
+            key = _normalize_name(item.name)
+            normalized[key] = _AMBIGUOUS if key in normalized else item
+        self._exact = exact
+        self._normalized = normalized
+
+    def _get(self, name):
+        item = self._exact.get(name)
+        if item is None:
+            item = self._normalized.get(_normalize_name(name))
+        return None if item is _AMBIGUOUS else item
+
+    def __getitem__(self, name: str):
+        item = self._get(name) if isinstance(name, str) else None
+        if item is None:
+            raise KeyError(name)
+        return item
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self._get(name) is not None
+
+    def __iter__(self):
+        return iter(self._exact)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def __repr__(self) -> str:
+        return f"SpecIndex({list(self)})"
+
+
+class DeviceSpec(_Frozen):
+    """
+    设备型号规格
+
+    同一型号的所有 mijiaDevice 共享同一个 DeviceSpec（进程内按 model 缓存），
+    其中的 DevProp/DevAction 均为只读对象。
+
+    参数:
+        model (str): 设备型号
+        info (dict): get_device_info 返回的规格信息
+    """
+    __slots__ = ("model", "name", "props", "actions", "ttls")
+
+    def __init__(self, model: str, info: dict):
+        props = SpecIndex(DevProp(prop) for prop in info.get("properties", []))
+        self._init(
+            model=model,
+            name=info["name"],
+            props=props,
+            actions=SpecIndex(DevAction(act) for act in info.get("actions", [])),
+            # (siid, piid) -> 属性状态缓存有效期，供 PropertyCache 使用
+            ttls=MappingProxyType({
+                (prop.method["siid"], prop.method["piid"]): property_ttl(prop) for prop in props.values()
+            }),
+        )
+
+    def __repr__(self) -> str:
+        return f"DeviceSpec({self.model!r}, props={len(self.props)}, actions={len(self.actions)})"
+
+
+# (规格存储路径或 None, model) -> (DeviceSpec, 规格获取时间)
+_device_specs: dict = {}
+_device_specs_lock = threading.Lock()
+
+
+def get_device_spec(
+        model: str,
+        cache_path: Optional[Union[str, Path]] = None,
+        max_age: Optional[float] = None,
+) -> DeviceSpec:
+    """
+    获取 model 对应的 DeviceSpec
+
+    同一规格存储中的同一型号在进程内只编译一次，之后直接返回共享对象，
+    不再读取规格存储；规格超过 max_age 时重新加载并在后台校验，
+    校验发现规格变化后，下次调用会重新编译。
+
+    参数:
+        model (str): 设备型号
+        cache_path (Optional[Union[str, Path]]): 可选，规格存储目录，含义同 get_device_info
+        max_age (Optional[float]): 可选，规格最长有效期（秒），默认为 SPEC_MAX_AGE
+
+    返回值:
+        DeviceSpec: 同型号共享的只读规格对象
+    """
+    key = (open_spec_store(cache_path).path if cache_path is not None else None, model)
+    with _device_specs_lock:
+        cached = _device_specs.get(key)
+    if cached is not None and time.time() - cached[1] < (SPEC_MAX_AGE if max_age is None else max_age):
+        return cached[0]
+    with tracer.span("get_device_info", model=model) as span:
+        info, fetched_at = _load_device_info(model, cache_path, max_age, span)
+    with _device_specs_lock:
+        cached = _device_specs.get(key)
+        # 规格存储只会通过 put 更新规格内容，获取时间未变说明规格未变，继续共享已编译的对象
+        if cached is not None and cached[1] == fetched_at:
+            return cached[0]
+    with tracer.span("compile_spec", model=model):
+        spec = DeviceSpec(model, info)
+    with _device_specs_lock:
+        _device_specs[key] = (spec, fetched_at)
+    return spec
+
+
+def _first_error(results: list):
+    """批量结果中第一个非 0 的错误码，全部成功时返回 0"""
+    return next((ret.get("code") for ret in results if ret.get("code", 0) != 0), 0)
+
+
 class mijiaDevice():
     def __init__(
             self,
             api: mijiaAPI,
             did: Optional[str] = None,
             dev_name: Optional[str] = None,
-            sleep_time: float = 0.5,
+            sleep_time: float = 0.0,
+            spec_max_age: Optional[float] = None,
     ):
         self.api = api
 
@@ -73,54 +319,43 @@ class mijiaDevice():
         if did is not None and dev_name is not None:
             logger.warning("同时提供了 did 和 dev_name 参数，将忽略 dev_name")
 
-        devices_list = self.api.get_devices_list()
-        if did is None:
-            matches = [device for device in devices_list if device["name"] == dev_name]
-            if not matches:
-                raise DeviceNotFoundError(dev_name)
-            else:
-                if len(matches) > 1:
-                    raise MultipleDevicesFoundError(f"找到多个 dev_name 为 '{dev_name}' 的设备，请使用 did 参数指定具体设备或者修改设备名称以区分")
-                did = matches[0]["did"]
-                model = matches[0]["model"]
-        else:
-            matches = [device for device in devices_list if device["did"] == did]
-            if not matches:
-                raise DeviceNotFoundError(did)
+        with tracer.span("mijiaDevice", did=did, name=dev_name):
+            with tracer.span("registry_lookup"):
+                device = self.api.device_registry.lookup(did=did, name=dev_name)
+            if did is None:
+                did = device["did"]
             else:
-                if len(matches) > 1:
-                    raise MultipleDevicesFoundError(f"找到多个 did 为 '{did}' 的设备，未预想的问题，欢迎提交 issue: https://github.com/Do1e/mijia-api/issues")
-                dev_name = matches[0].get("name", None)
-                model = matches[0]["model"]
+                dev_name = device.get("name", None)
+            model = device["model"]
 
-        dev_info = get_device_info(model, cache_path=api.auth_data_path.parent)
+            spec = get_device_spec(model, cache_path=api.auth_data_path.parent, max_age=spec_max_age)
+        self.spec = spec
         self.did = did
         self.model = model
-        self.name = dev_name if dev_name is not None else dev_info["name"]
+        self.name = dev_name if dev_name is not None else self.spec.name
         self.sleep_time = sleep_time
 
-        self.prop_list = {}
-        for prop in dev_info.get("properties", []):
-            prop_obj = DevProp(prop)
-            name = prop["name"]
-            self.prop_list[name] = prop_obj
-            if "-" in name:
-                self.prop_list[name.replace("-", "_")] = prop_obj
-
-        self.action_list = {
-            act["name"]: DevAction(act)
-            for act in dev_info.get("actions", [])
-        }
+        # 同一型号的设备共享规格对象，名称中的 '-' 与 '_' 可以互换
+        self.prop_list = self.spec.props
+        self.action_list = self.spec.actions
+        self.api.prop_cache.register(did, self.spec.ttls)
 
     def __str__(self) -> str:
-        prop_list_str = "\n".join(filter(None, (str(v) for k, v in self.prop_list.items() if "_" not in k)))
+        prop_list_str = "\n".join(map(str, self.prop_list.values()))
         action_list_str = "\n".join(map(str, self.action_list.values()))
         return (f"{self.name} ({self.model})\n"
                 f"Properties:\n{prop_list_str if prop_list_str else 'No properties available'}\n"
                 f"Actions:\n{action_list_str if action_list_str else 'No actions available'}")
 
 
-    def get(self, name: str) -> Union[bool, int, float, str]:
+    def get(self, name: str, max_age: Optional[float] = None) -> Union[bool, int, float, str]:
+        """
+        获取属性值
+
+        参数:
+            name (str): 属性名称
+            max_age (Optional[float]): 可选，可接受的缓存时间（秒），参见 mijiaAPI.get_devices_prop
+        """
         if name not in self.prop_list:
             raise ValueError(f"不支持的属性: {name}, 可用属性: {list(self.prop_list.keys())}")
         prop = self.prop_list[name]
@@ -128,73 +363,161 @@ class mijiaDevice():
             raise ValueError(f"属性 {name} 不可读取")
         method = prop.method.copy()
         method["did"] = self.did
-        result = self.api.get_devices_prop(method)
+        started = time.perf_counter()
+        result = self.api.get_devices_prop(method, max_age=max_age)
+        self.api.metrics.record_device(self.did, "get", result["code"], time.perf_counter() - started)
         if result["code"] != 0:
             raise DeviceGetError(self.name, name, result["code"])
-        time.sleep(self.sleep_time)
+        if self.sleep_time:
+            time.sleep(self.sleep_time)
         logger.debug(f"获取属性: {self.name} -> {name}, 结果: {result}")
         return result["value"]
 
-    def set(self, name: str, value: Union[bool, int, float, str]):
+    def get_many(self, names: list, raise_on_error: bool = True, max_age: Optional[float] = None) -> dict:
+        """
+        批量获取多个属性
+
+        所有属性合并为一次 get_devices_prop 调用（超过 PROP_BATCH_SIZE 时由 mijiaAPI 自动拆分），
+        按 siid/piid 将结果对应回属性名称，且不会在每个属性之后等待 sleep_time。
+
+        参数:
+            names (list): 属性名称列表
+            raise_on_error (bool): 某个属性获取失败时是否抛出 DeviceGetError，
+                为 False 时跳过失败的属性
+            max_age (Optional[float]): 可选，可接受的缓存时间（秒），参见 mijiaAPI.get_devices_prop
+
+        返回值:
+            dict: 属性名称 -> 属性值
+        """
+        props = {}
+        for name in names:
+            if name not in self.prop_list:
+                raise ValueError(f"不支持的属性: {name}, 可用属性: {list(self.prop_list.keys())}")
+            prop = self.prop_list[name]
+            if "r" not in prop.rw:
+                raise ValueError(f"属性 {name} 不可读取")
+            props[name] = prop
+        if not props:
+            return {}
+
+        params = []
+        for prop in props.values():
+            method = {**prop.method, "did": self.did}
+            if method not in params:
+                params.append(method)
+        started = time.perf_counter()
+        results = self.api.get_devices_prop(params, max_age=max_age)
+        self.api.metrics.record_device(self.did, "get_many", _first_error(results), time.perf_counter() - started)
+        result_map = {(ret.get("siid"), ret.get("piid")): ret for ret in results}
+
+        values = {}
+        for name, prop in props.items():
+            result = result_map.get((prop.method["siid"], prop.method["piid"]), {"code": -1})
+            if result.get("code", 0) != 0 or "value" not in result:
+                if raise_on_error:
+                    raise DeviceGetError(self.name, name, result.get("code", -1))
+                logger.debug(f"获取属性失败: {self.name} -> {name}, 结果: {result}")
+                continue
+            values[name] = result["value"]
+        logger.debug(f"批量获取属性: {self.name} -> {values}")
+        return values
+
+    def snapshot(self, max_age: Optional[float] = None) -> dict:
+        """
+        获取所有可读属性的当前值
+
+        参数:
+            max_age (Optional[float]): 可选，可接受的缓存时间（秒），参见 mijiaAPI.get_devices_prop
+
+        返回值:
+            dict: 属性名称 -> 属性值，读取失败的属性不包含在内
+        """
+        names = [name for name, prop in self.prop_list.items() if "r" in prop.rw]
+        return self.get_many(names, raise_on_error=False, max_age=max_age)
+
+    def _check_value(self, name: str, value: Union[bool, int, float, str]) -> Union[bool, int, float, str]:
+        """按属性定义校验并转换待写入的值，无效时抛出 ValueError"""
+        return self._writable_prop(name).check(value)
+
+    def _writable_prop(self, name: str) -> DevProp:
         if name not in self.prop_list:
             raise ValueError(f"不支持的属性: {name}, 可用属性: {list(self.prop_list.keys())}")
         prop = self.prop_list[name]
         if "w" not in prop.rw:
             raise ValueError(f"属性 {name} 不可写入")
-        if prop.type == "bool":
-            if isinstance(value, str):
-                if value.lower() == "true":
-                    value = True
-                elif value.lower() == "false":
-                    value = False
-                elif value in ["0", "1"]:
-                    value = bool(int(value))
-                else:
-                    raise ValueError(f"无效布尔值: {value}")
-            elif isinstance(value, int):
-                if value == 0:
-                    value = False
-                elif value == 1:
-                    value = True
-                else:
-                    raise ValueError(f"无效布尔值: {value}")
-            elif not isinstance(value, bool):
-                raise ValueError(f"无效布尔值: {value}")
-        elif prop.type in ["int", "uint"]:
-            value = int(value)
-            if prop.range:
-                if value < prop.range[0] or value > prop.range[1]:
-                    raise ValueError(f"{value} 超出数值范围, 应该在 {prop.range[:2]} 之间")
-                if len(prop.range) >= 3 and prop.range[2] != 1:
-                    if (value - prop.range[0]) % prop.range[2] != 0:
-                        raise ValueError(
-                            f"无效的值: {value}, 应该在范围 {prop.range[:2]} 内且步长为 {prop.range[2]}")
-        elif prop.type == "float":
-            value = float(value)
-            if prop.range:
-                if value < prop.range[0] or value > prop.range[1]:
-                    raise ValueError(f"{value} 超出数值范围, 应该在 {prop.range[:2]} 之间")
-                if len(prop.range) >= 3 and isinstance(prop.range[2], int):
-                    if int(value - prop.range[0]) % prop.range[2] != 0:
-                        raise ValueError(
-                            f"无效的值: {value}, 应该在范围 {prop.range[:2]} 内且步长为 {prop.range[2]}")
-        elif prop.type == "string":
-            if not isinstance(value, str):
-                raise ValueError(f"无效字符串值: {value}")
-        else:
-            raise ValueError(f"不支持的类型: {prop.type}, 可用类型: bool, int, uint, float, string")
-        if prop.value_list:
-            if value not in [item["value"] for item in prop.value_list]:
-                raise ValueError(f"无效值: {value}, 请使用 {prop.value_list}")
+        return prop
+
+    def validate(self, values: dict) -> dict:
+        """
+        批量校验并转换待写入的值
+
+        一次检查全部属性，存在无效值时抛出 ValueError，错误信息中列出所有无效的属性。
+
+        参数:
+            values (dict): 属性名称 -> 待设置的值
+
+        返回值:
+            dict: 属性名称 -> 转换后的值
+        """
+        checked = {}
+        errors = []
+        for name, value in values.items():
+            try:
+                checked[name] = self._writable_prop(name).check(value)
+            except ValueError as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise ValueError("; ".join(errors))
+        return checked
+
+    def set(self, name: str, value: Union[bool, int, float, str]):
+        value = self._check_value(name, value)
+        prop = self.prop_list[name]
         method = prop.method.copy()
         method["did"] = self.did
         method["value"] = value
+        started = time.perf_counter()
         result = self.api.set_devices_prop(method)
+        self.api.metrics.record_device(self.did, "set", result["code"], time.perf_counter() - started)
         if result["code"] != 0:
             raise DeviceSetError(self.name, name, result["code"])
-        time.sleep(self.sleep_time)
+        if self.sleep_time:
+            time.sleep(self.sleep_time)
         logger.debug(f"设置属性: {self.name} -> {name}, 值: {value}, 结果: {result}")
 
+    def set_many(self, values: dict) -> dict:
+        """
+        批量设置多个属性
+
+        先按属性定义校验所有值（任一无效时抛出 ValueError，不会写入任何属性），
+        再合并为一次 set_devices_prop 调用，不会在每个属性之后等待 sleep_time。
+
+        参数:
+            values (dict): 属性名称 -> 待设置的值
+
+        返回值:
+            dict: 属性名称 -> 设置结果，包含 code（0 表示成功）和 message 字段
+
+        示例:
+            >>> device.set_many({"brightness": 40, "color-temperature": 3000, "mode": 1})
+        """
+        checked = self.validate(values)
+        if not checked:
+            return {}
+        params = [{**self.prop_list[name].method, "did": self.did, "value": value}
+                  for name, value in checked.items()]
+        started = time.perf_counter()
+        results = self.api.set_devices_prop(params)
+        self.api.metrics.record_device(self.did, "set_many", _first_error(results), time.perf_counter() - started)
+        result_map = {(ret.get("siid"), ret.get("piid")): ret for ret in results}
+        report = {}
+        for name in checked:
+            method = self.prop_list[name].method
+            result = result_map.get((method["siid"], method["piid"]), {"code": -1, "message": "未知错误"})
+            report[name] = {"code": result.get("code", 0), "message": result.get("message", "")}
+        logger.debug(f"批量设置属性: {self.name} -> {checked}, 结果: {report}")
+        return report
+
     def __getattr__(self, name: str) -> Union[bool, int, float, str]:
         if "prop_list" in self.__dict__ and name in self.prop_list:
             return self.get(name)
@@ -227,14 +550,21 @@ class mijiaDevice():
                 if k in method:
                     raise ValueError(f"无效的参数: {k}. 请勿使用以下参数 ({', '.join(method.keys())})")
                 method[k] = v
+        started = time.perf_counter()
         result = self.api.run_action(method)
+        self.api.metrics.record_device(self.did, "action", result["code"], time.perf_counter() - started)
         if result["code"] != 0:
             raise DeviceActionError(self.name, name, result["code"])
-        time.sleep(self.sleep_time)
+        if self.sleep_time:
+            time.sleep(self.sleep_time)
         logger.debug(f"执行动作: {self.name} -> {name}, 结果: {result}")
 
 
-def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] = None) -> dict:
+def get_device_info(
+        device_model: str,
+        cache_path: Optional[Union[str, Path]] = None,
+        max_age: Optional[float] = None,
+) -> dict:
     """
     获取设备规格信息
 
@@ -245,7 +575,11 @@ def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] =
         device_model (str): 设备型号，例如 'yeelink.light.lamp4'
         cache_path (Optional[Union[str, Path]]): 可选，缓存目录路径。
             - 如果为 None，则不使用缓存
-            - 如果指定，则将设备信息缓存到该目录下的 {device_model}.json 文件中
+            - 如果指定，则将设备信息缓存到该目录下的规格存储 specs.db 中，
+              目录下旧版的 {device_model}.json 缓存文件会在首次读取时自动导入
+        max_age (Optional[float]): 可选，缓存最长有效期（秒），默认为 SPEC_MAX_AGE。
+            缓存总是立即返回；超过有效期的缓存会在后台线程中使用条件请求
+            （If-None-Match/If-Modified-Since）重新校验，更新后的规格在下次读取时生效
 
     返回值:
         dict: 设备规格信息字典，包含以下字段：
@@ -273,22 +607,165 @@ def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] =
         >>> print(info['name'])  # 输出设备名称
         >>> print(info['properties'][0]['name'])  # 输出第一个属性的名称
     """
-    if cache_path is not None:
-        cache_file = Path(cache_path) / f"{device_model}.json"
-        if cache_file.exists():
-            logger.debug(f"从缓存加载设备信息: {cache_file}")
-            with cache_file.open("r", encoding="utf-8") as f:
-                return json.load(f)
-    response = requests.get(device_url + device_model, headers={
-        "User-Agent": f"mijiaAPI/{version}"
-    })
+    with tracer.span("get_device_info", model=device_model) as span:
+        return _load_device_info(device_model, cache_path, max_age, span)[0]
+
+
+def _load_device_info(device_model: str, cache_path, max_age: Optional[float], span) -> tuple:
+    """返回 (规格信息, 规格获取时间)"""
+    if cache_path is None:
+        span.args["source"] = "network"
+        return _fetch_spec(device_model)[0], time.time()
+
+    store = open_spec_store(cache_path)
+    entry = store.get_entry(device_model)
+    if entry is None:
+        legacy_file = Path(cache_path) / f"{device_model}.json"
+        if legacy_file.exists() and store.import_json_file(legacy_file):
+            logger.debug(f"从旧版缓存导入设备信息: {legacy_file}")
+            entry = store.get_entry(device_model)
+    if entry is not None:
+        logger.debug(f"从规格存储加载设备信息: {device_model}")
+        span.args["source"] = "cache"
+        if time.time() - entry["fetched_at"] >= (SPEC_MAX_AGE if max_age is None else max_age):
+            _schedule_revalidation(store, device_model, entry)
+        return entry["info"], entry["fetched_at"]
+
+    span.args["source"] = "network"
+    result, etag, last_modified = _fetch_spec(device_model)
+    logger.debug(f"缓存设备信息到规格存储: {device_model}")
+    fetched_at = time.time()
+    store.put(device_model, result, fetched_at=fetched_at, etag=etag, last_modified=last_modified)
+    return result, fetched_at
+
+
+def _fetch_spec(device_model: str, entry: Optional[dict] = None) -> tuple:
+    """
+    从规格平台下载并解析设备规格
+
+    提供 entry 时发送条件请求，服务器返回 304 时结果为 None。
+
+    返回值:
+        tuple: (规格信息或 None, ETag, Last-Modified)
+    """
+    headers = {"User-Agent": f"mijiaAPI/{version}"}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    with tracer.span("fetch_spec", model=device_model, conditional=entry is not None) as span:
+        response = requests.get(device_url + device_model, headers=headers, timeout=30)
+        span.args["status"] = response.status_code
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if entry is not None and response.status_code == 304:
+        return None, etag, last_modified
     if response.status_code != 200:
         raise GetDeviceInfoError(device_model)
-    content = re.search(r"data-page=\"(.*?)\">", response.text)
+    with tracer.span("parse_spec", model=device_model):
+        info = _parse_spec_page(response.text, device_model)
+    return info, etag, last_modified
+
+
+def _schedule_revalidation(store, device_model: str, entry: dict):
+    """在后台线程中重新校验过期的规格缓存，同一型号同时只有一个校验任务"""
+    key = (store.path, device_model)
+    now = time.monotonic()
+    with _revalidating_lock:
+        last = _revalidating.get(key)
+        # None 表示校验进行中，数值为上次失败的时间
+        if key in _revalidating and (last is None or now - last < SPEC_RETRY_INTERVAL):
+            return
+        _revalidating[key] = None
+    threading.Thread(
+        target=_revalidate_spec,
+        args=(store, device_model, entry, key),
+        name=f"mijiaSpecRevalidate-{device_model}",
+        daemon=True,
+    ).start()
+
+
+def _revalidate_spec(store, device_model: str, entry: dict, key: tuple):
+    try:
+        result, etag, last_modified = _fetch_spec(device_model, entry)
+    except Exception as e:
+        logger.debug(f"后台校验设备规格失败: {device_model}, {e}")
+        with _revalidating_lock:
+            _revalidating[key] = time.monotonic()
+        return
+    fetched_at = time.time()
+    # 服务器可能忽略条件请求直接返回 200，内容相同时与 304 一样处理
+    if result is None or result == entry["info"]:
+        logger.debug(f"设备规格未变化: {device_model}")
+        store.touch(device_model, fetched_at=fetched_at, etag=etag, last_modified=last_modified)
+        # 已编译的 DeviceSpec 仍然有效，只更新其获取时间
+        with _device_specs_lock:
+            cached = _device_specs.get(key)
+            if cached is not None:
+                _device_specs[key] = (cached[0], fetched_at)
+    else:
+        logger.info(f"设备规格已更新: {device_model}")
+        store.put(device_model, result, fetched_at=fetched_at, etag=etag, last_modified=last_modified)
+        with _device_specs_lock:
+            _device_specs.pop(key, None)
+    with _revalidating_lock:
+        _revalidating.pop(key, None)
+
+
+def warm_spec_cache(
+        api: mijiaAPI,
+        cache_path: Optional[Union[str, Path]] = None,
+        max_workers: int = 8,
+) -> dict:
+    """
+    预取设备规格
+
+    从 get_devices_list() 和 get_shared_devices_list() 收集所有设备型号，
+    并发获取规格存储中尚未缓存的型号，之后创建 mijiaDevice 时无需再等待网络请求。
+
+    参数:
+        api (mijiaAPI): API 实例
+        cache_path (Optional[Union[str, Path]]): 可选，规格存储目录，默认与 mijiaDevice 相同（认证文件所在目录）
+        max_workers (int): 最大并发请求数
+
+    返回值:
+        dict: 预取结果，包含以下字段：
+            - models (int): 设备型号总数
+            - cached (int): 已在缓存中的型号数量
+            - fetched (list): 本次获取成功的型号
+            - failed (dict): 获取失败的型号 -> 错误信息
+    """
+    if cache_path is None:
+        cache_path = api.auth_data_path.parent
+    store = open_spec_store(cache_path)
+    models = sorted({device["model"] for device in api.device_registry.refresh(include_shared=True) if device.get("model")})
+    missing = [model for model in models if model not in store]
+    result = {"models": len(models), "cached": len(models) - len(missing), "fetched": [], "failed": {}}
+    if not missing:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing)), thread_name_prefix="mijiaSpec") as executor:
+        futures = {executor.submit(get_device_info, model, cache_path): model for model in missing}
+        for future in as_completed(futures):
+            model = futures[future]
+            try:
+                future.result()
+                result["fetched"].append(model)
+            except Exception as e:
+                logger.warning(f"预取设备规格失败: {model}, {e}")
+                result["failed"][model] = str(e)
+    result["fetched"].sort()
+    logger.debug(f"设备规格预取完成: {result}")
+    return result
+
+
+def _parse_spec_page(page: str, device_model: str) -> dict:
+    """解析 home.miot-spec.com 规格页面中 data-page 属性携带的 JSON，转换为 get_device_info 的返回格式"""
+    content = data_page_pattern.search(page)
     if content is None:
         raise GetDeviceInfoError(device_model)
-    content = content.group(1)
-    content = json.loads(content.replace("&quot;", "\""))
+    content = json.loads(html.unescape(content.group(1)))
 
     if content["props"]["product"]:
         name = content["props"]["product"]["name"]
@@ -350,12 +827,4 @@ def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] =
                         "aiid": int(aiid)
                     }
                 })
-
-    if cache_path is not None:
-        cache_path = Path(cache_path)
-        cache_path.mkdir(parents=True, exist_ok=True)
-        cache_file = cache_path / f"{device_model}.json"
-        logger.debug(f"缓存设备信息到: {cache_file}")
-        with cache_file.open("w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
     return result
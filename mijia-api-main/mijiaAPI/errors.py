@@ -56,6 +56,8 @@ class LoginError(Exception):
 
 class APIError(Exception):
     def __init__(self, code: int, message: str):
+        self.code = code
+        self.message = message
         super().__init__(f"code: {code}, message: {message}")
 
 class DeviceNotFoundError(Exception):
@@ -0,0 +1,46 @@
+import json
+from typing import Any, Union
+
+
+# 可选的高性能 JSON 库，依次尝试 orjson、ujson，均未安装时使用标准库 json
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover - 可选依赖
+    ujson = None
+
+
+if orjson is not None:
+    backend = "orjson"
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+elif ujson is not None:
+    backend = "ujson"
+    # ujson 解析失败时抛出 ValueError
+    JSONDecodeError = ValueError
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return ujson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+else:
+    backend = "json"
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'))
@@ -0,0 +1,329 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from .errors import ERROR_CODE, APIError
+from .logger import logger
+
+
+# 请求各阶段：等待限流、签名加密、网络往返、解密解压、JSON 解析
+PHASES = ("wait", "sign", "network", "decrypt", "parse")
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# 非服务端错误码：请求超时，其他异常以异常类名作为错误码
+_LOCAL_ERRORS = {"timeout": "请求超时"}
+
+
+def error_message(code) -> str:
+    """错误码对应的说明"""
+    if isinstance(code, str) and not code.lstrip("-").isdigit():
+        return _LOCAL_ERRORS.get(code, code)
+    return ERROR_CODE.get(str(code), "未知错误")
+
+
+class Histogram():
+    """累积分布直方图，buckets 为各桶上界，最后一个桶为 +Inf"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数（返回所在桶的上界），超出最大桶时返回最大上界"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class _UriStats():
+    __slots__ = ("requests", "errors", "bytes_sent", "bytes_received", "duration", "phases")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors: dict = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.duration = Histogram()
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+
+class _DeviceStats():
+    __slots__ = ("requests", "errors", "operations")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors: dict = {}
+        # 操作 -> [次数, 失败次数, 总耗时]
+        self.operations: dict = {}
+
+
+class RequestRecord():
+    """
+    一次请求的计时记录，由 MetricsRegistry.request() 创建
+
+    mark(phase) 记录从上一次 mark（或开始）到现在的耗时；
+    with 块结束时按异常设置错误码并写入注册表。
+    """
+    __slots__ = ("registry", "uri", "dids", "phases", "bytes_sent", "bytes_received", "code", "started", "_last")
+
+    def __init__(self, registry: "MetricsRegistry", uri: str, dids: list):
+        self.registry = registry
+        self.uri = uri
+        self.dids = dids
+        self.phases: dict = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.code = 0
+        self.started = self._last = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def __enter__(self) -> "RequestRecord":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.code == 0:
+            self.code = exc.code if isinstance(exc, APIError) else type(exc).__name__
+        self.registry.record(self)
+
+
+class MetricsRegistry():
+    """
+    请求指标
+
+    按 URI 记录请求数、错误码计数、发送/接收字节数、总耗时与各阶段（限流等待、签名、网络、解密、解析）耗时直方图，
+    按 did 记录请求数、错误码计数以及 mijiaDevice 的各类操作次数和耗时。
+    snapshot() 返回当前指标，to_prometheus() 导出 Prometheus 文本格式；
+    write_prometheus()/export_prometheus() 将其写入文件，供 node_exporter 的 textfile collector 等 sidecar 抓取。
+
+    示例:
+        >>> api.metrics.snapshot()["uris"]["/miotspec/prop/get"]["requests"]
+        >>> print(api.metrics.to_prometheus())
+        >>> stop = api.metrics.export_prometheus("/var/lib/node_exporter/mijia.prom", interval=15)
+    """
+    def __init__(self):
+        self._uris: dict = {}
+        self._devices: dict = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def request(self, uri: str, dids: Optional[list] = None) -> RequestRecord:
+        """开始记录一次请求，配合 with 使用"""
+        # 同一请求中同一设备的多个属性只计一次
+        return RequestRecord(self, uri, list(dict.fromkeys(str(did) for did in dids or [])))
+
+    def record(self, record: RequestRecord):
+        total = time.perf_counter() - record.started
+        with self._lock:
+            stats = self._uris.get(record.uri)
+            if stats is None:
+                stats = self._uris[record.uri] = _UriStats()
+            stats.requests += 1
+            stats.bytes_sent += record.bytes_sent
+            stats.bytes_received += record.bytes_received
+            stats.duration.observe(total)
+            for phase, seconds in record.phases.items():
+                stats.phases[phase].observe(seconds)
+            if record.code != 0:
+                stats.errors[record.code] = stats.errors.get(record.code, 0) + 1
+            for did in record.dids:
+                device = self._device(did)
+                device.requests += 1
+                if record.code != 0:
+                    device.errors[record.code] = device.errors.get(record.code, 0) + 1
+
+    def _device(self, did: str) -> _DeviceStats:
+        device = self._devices.get(did)
+        if device is None:
+            device = self._devices[did] = _DeviceStats()
+        return device
+
+    def record_device(self, did: str, operation: str, code=0, seconds: float = 0.0):
+        """记录一次设备操作（get、set、action 等）的结果码与耗时"""
+        with self._lock:
+            device = self._device(str(did))
+            entry = device.operations.get(operation)
+            if entry is None:
+                entry = device.operations[operation] = [0, 0, 0.0]
+            entry[0] += 1
+            entry[2] += seconds
+            if code != 0:
+                entry[1] += 1
+                device.errors[code] = device.errors.get(code, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._uris.clear()
+            self._devices.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        """返回当前指标的副本"""
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "uris": {uri: {
+                    "requests": stats.requests,
+                    "errors": {str(code): {"count": count, "message": error_message(code)}
+                               for code, count in stats.errors.items()},
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                    "duration": stats.duration.to_dict(),
+                    "phases": {phase: hist.to_dict() for phase, hist in stats.phases.items() if hist.count},
+                } for uri, stats in self._uris.items()},
+                "devices": {did: {
+                    "requests": device.requests,
+                    "errors": {str(code): count for code, count in device.errors.items()},
+                    "operations": {op: {"count": count, "errors": errors, "seconds": seconds}
+                                   for op, (count, errors, seconds) in device.operations.items()},
+                } for did, device in self._devices.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "mijia") -> str:
+        """导出为 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, labels: str, hist: Histogram):
+            cumulative = 0
+            for bound, count in zip([*map(str, hist.buckets), "+Inf"], hist.counts):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_{name}_sum{{{labels}}} {hist.sum}")
+            lines.append(f"{prefix}_{name}_count{{{labels}}} {hist.count}")
+
+        with self._lock:
+            uris = sorted(self._uris.items())
+            devices = sorted(self._devices.items())
+            header("requests_total", "counter", "各接口的请求数")
+            for uri, stats in uris:
+                lines.append(f'{prefix}_requests_total{{uri="{_escape(uri)}"}} {stats.requests}')
+            header("request_errors_total", "counter", "各接口按错误码统计的失败请求数")
+            for uri, stats in uris:
+                for code, count in stats.errors.items():
+                    lines.append(f'{prefix}_request_errors_total{{uri="{_escape(uri)}",code="{_escape(code)}",'
+                                 f'message="{_escape(error_message(code))}"}} {count}')
+            header("request_sent_bytes_total", "counter", "各接口发送的请求体字节数")
+            for uri, stats in uris:
+                lines.append(f'{prefix}_request_sent_bytes_total{{uri="{_escape(uri)}"}} {stats.bytes_sent}')
+            header("response_received_bytes_total", "counter", "各接口接收的响应体字节数")
+            for uri, stats in uris:
+                lines.append(f'{prefix}_response_received_bytes_total{{uri="{_escape(uri)}"}} {stats.bytes_received}')
+            header("request_duration_seconds", "histogram", "各接口的请求总耗时")
+            for uri, stats in uris:
+                histogram("request_duration_seconds", f'uri="{_escape(uri)}"', stats.duration)
+            header("request_phase_seconds", "histogram", "各接口各阶段的耗时")
+            for uri, stats in uris:
+                for phase, hist in stats.phases.items():
+                    if hist.count:
+                        histogram("request_phase_seconds", f'uri="{_escape(uri)}",phase="{phase}"', hist)
+            header("device_requests_total", "counter", "涉及各设备的请求数")
+            for did, device in devices:
+                lines.append(f'{prefix}_device_requests_total{{did="{_escape(did)}"}} {device.requests}')
+            header("device_errors_total", "counter", "各设备按错误码统计的失败次数")
+            for did, device in devices:
+                for code, count in device.errors.items():
+                    lines.append(f'{prefix}_device_errors_total{{did="{_escape(did)}",code="{_escape(code)}"}} {count}')
+            header("device_operations_total", "counter", "各设备的 mijiaDevice 操作次数")
+            for did, device in devices:
+                for op, (count, _, _) in device.operations.items():
+                    lines.append(f'{prefix}_device_operations_total{{did="{_escape(did)}",operation="{op}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Union[str, Path], prefix: str = "mijia"):
+        """将 Prometheus 文本格式写入 path，先写临时文件再替换，抓取方不会读到写了一半的文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(path.name + ".tmp")
+        with tmp_file.open("w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_file, path)
+
+    def export_prometheus(self, path: Union[str, Path], interval: float = 15.0, prefix: str = "mijia") -> Callable[[], None]:
+        """
+        在后台线程中每隔 interval 秒调用一次 write_prometheus(path)
+
+        返回值:
+            Callable[[], None]: 停止导出的函数，停止时会再写入一次最终的指标
+        """
+        stopped = threading.Event()
+
+        def loop():
+            while not stopped.wait(interval):
+                try:
+                    self.write_prometheus(path, prefix)
+                except OSError as e:
+                    logger.warning(f"写入 Prometheus 指标文件失败: {e}")
+
+        self.write_prometheus(path, prefix)
+        thread = threading.Thread(target=loop, name="mijiaMetricsExport", daemon=True)
+        thread.start()
+
+        def stop():
+            stopped.set()
+            thread.join()
+            self.write_prometheus(path, prefix)
+
+        return stop
+
+    def summary(self) -> str:
+        """按 URI 汇总的可读文本，用于命令行输出"""
+        snapshot = self.snapshot()
+        lines = []
+        with self._lock:
+            uris = sorted(self._uris.items(), key=lambda item: item[1].duration.sum, reverse=True)
+            for uri, stats in uris:
+                duration = stats.duration
+                phases = ", ".join(f"{phase} {hist.sum / hist.count * 1000:.1f}ms"
+                                   for phase, hist in stats.phases.items() if hist.count)
+                errors = sum(stats.errors.values())
+                lines.append(
+                    f"{uri}: {stats.requests} 次, 失败 {errors} 次, "
+                    f"平均 {duration.sum / duration.count * 1000:.1f}ms, p95 ≤ {duration.quantile(0.95) * 1000:.0f}ms, "
+                    f"发送 {stats.bytes_sent} B, 接收 {stats.bytes_received} B"
+                )
+                if phases:
+                    lines.append(f"  阶段平均: {phases}")
+                for code, count in stats.errors.items():
+                    lines.append(f"  错误 {code} ({error_message(code)}): {count} 次")
+        for did, device in snapshot["devices"].items():
+            if device["errors"]:
+                errors = ", ".join(f"{code}: {count}" for code, count in device["errors"].items())
+                lines.append(f"设备 {did}: {device['requests']} 次请求, 错误 {errors}")
+        return "\n".join(lines) if lines else "没有请求记录"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
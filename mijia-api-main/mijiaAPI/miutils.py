@@ -11,11 +11,12 @@ import base64
 import hashlib
 import random
 import time
-from gzip import GzipFile
-from io import BytesIO
+import zlib
 
 from Crypto.Cipher import ARC4
 
+from .tracing import tracer
+
 
 def gen_nonce():
     millis = int(round(time.time() * 1000))
@@ -72,10 +73,104 @@ def decrypt_rc4(password, payload):
     r.encrypt(bytes(1024))
     return r.encrypt(base64.b64decode(payload))
 
+# 加密响应体经 gzip 压缩时服务端返回的响应头，以及 gzip 魔数
+GZIP_HEADER = "MIOT-CONTENT-ENCODING"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def is_gzip(headers):
+    """根据响应头判断加密的响应体是否经过 gzip 压缩"""
+    return headers.get(GZIP_HEADER, "").upper() == "GZIP"
+
+
+def gunzip(data, gzip=False):
+    """data 经 gzip 压缩（gzip 为 True 或以魔数开头）时一次性解压，否则原样返回"""
+    if gzip or data[:2] == GZIP_MAGIC:
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+
 def decrypt(ssecurity, nonce, payload):
-    decrypted = decrypt_rc4(get_signed_nonce(ssecurity, nonce), payload)
-    try:
-        return decrypted.decode('utf-8')
-    except UnicodeDecodeError:
-        compressed_file = BytesIO(decrypted)
-        return GzipFile(fileobj=compressed_file, mode="rb").read().decode('utf-8')
+    return gunzip(decrypt_rc4(get_signed_nonce(ssecurity, nonce), payload)).decode('utf-8')
+
+
+class RC4Keystream():
+    """
+    signed_nonce 对应的 RC4 密钥流（已丢弃前 1024 字节）
+
+    同一次请求中每个参数的加密和响应的解密都从同一个 RC4 状态开始，
+    因此只需初始化一次 ARC4 并按需延长密钥流，之后与数据异或即可，
+    等价于为每个参数/响应分别克隆一份初始状态。
+    """
+    __slots__ = ("_cipher", "_stream")
+
+    def __init__(self, signed_nonce):
+        self._cipher = ARC4.new(base64.b64decode(signed_nonce))
+        self._cipher.encrypt(bytes(1024))
+        self._stream = b""
+
+    def crypt(self, data):
+        n = len(data)
+        if len(self._stream) < n:
+            self._stream += self._cipher.encrypt(bytes(n - len(self._stream)))
+        return (int.from_bytes(data, "big") ^ int.from_bytes(self._stream[:n], "big")).to_bytes(n, "big")
+
+    def encrypt(self, payload):
+        return base64.b64encode(self.crypt(payload.encode())).decode()
+
+    def decrypt(self, payload):
+        return gunzip(self.crypt(base64.b64decode(payload))).decode('utf-8')
+
+    def decode_response(self, body, gzip=False):
+        """
+        将响应体解码为 JSON 字节串
+
+        明文响应（以 { 或 [ 开头，base64 密文中不会出现这两个字符）直接返回，
+        否则解密，再根据响应头（gzip 为 True）或 gzip 魔数一次性解压，不做试探性的解码。
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if body[:16].lstrip()[:1] in (b"{", b"["):
+            return body
+        return gunzip(self.crypt(base64.b64decode(body)), gzip)
+
+
+class RequestSigner():
+    """
+    请求签名器，每个会话一个
+
+    缓存解码后的 ssecurity，每次请求只生成一个 RC4Keystream，
+    供参数加密和响应解密共用。
+    """
+    __slots__ = ("ssecurity", "_ssecurity_bytes")
+
+    def __init__(self, ssecurity):
+        self.ssecurity = ssecurity
+        self._ssecurity_bytes = base64.b64decode(bytes(ssecurity, "utf-8"))
+
+    def signed_nonce(self, nonce):
+        m = hashlib.sha256(self._ssecurity_bytes)
+        m.update(base64.b64decode(bytes(nonce, "utf-8")))
+        return base64.b64encode(m.digest()).decode("utf-8")
+
+    def sign(self, uri, method, params, nonce=None):
+        """
+        签名并加密请求参数
+
+        返回值:
+            tuple: (加密后的 params, 用于解密响应的 RC4Keystream)
+        """
+        with tracer.span("nonce"):
+            nonce = nonce or gen_nonce()
+            signed_nonce = self.signed_nonce(nonce)
+            keystream = RC4Keystream(signed_nonce)
+        with tracer.span("enc_params"):
+            params["rc4_hash__"] = gen_enc_signature(uri, method, signed_nonce, params)
+            for k, v in params.items():
+                params[k] = keystream.encrypt(v)
+            params.update({
+                "signature": gen_enc_signature(uri, method, signed_nonce, params),
+                "ssecurity": self.ssecurity,
+                "_nonce": nonce,
+            })
+        return params, keystream
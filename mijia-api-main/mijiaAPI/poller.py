@@ -0,0 +1,300 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from .devices import get_device_spec
+from .logger import logger
+
+
+class _Subscription():
+    __slots__ = ("did", "name", "method", "interval", "handles", "next_due")
+
+    def __init__(self, did: str, name: str, method: dict, interval: float, next_due: float):
+        self.did = did
+        self.name = name
+        self.method = method
+        self.interval = interval
+        # 订阅句柄 -> (间隔, 回调)，同一属性的多次订阅共享一次轮询
+        self.handles: dict = {}
+        self.next_due = next_due
+
+    @property
+    def callbacks(self) -> list:
+        return [callback for _, callback in self.handles.values() if callback is not None]
+
+
+class _SubscriptionHandle():
+    """subscribe 返回的订阅句柄，unsubscribe 时只移除对应的这一次订阅"""
+    __slots__ = ("key",)
+
+    def __init__(self, key: tuple):
+        self.key = key
+
+    def __repr__(self) -> str:
+        return f"<PropertyPoller subscription {self.key}>"
+
+
+class _LagStats():
+    __slots__ = ("polls", "errors", "last_lag", "max_lag", "total_lag")
+
+    def __init__(self):
+        self.polls = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def record(self, lag: float, ok: bool):
+        self.polls += 1
+        if not ok:
+            self.errors += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+
+    def to_dict(self) -> dict:
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "avg_lag": self.total_lag / self.polls if self.polls else 0.0,
+        }
+
+
+class PropertyPoller():
+    """
+    合并轮询设备属性
+
+    按 (did, 属性名, 间隔) 订阅属性，属性名通过设备规格解析为 siid/piid；
+    每次调度把所有到期（以及 coalesce 时间窗内即将到期）的属性合并为一次 get_devices_prop 调用，
+    由 mijiaAPI 按 PROP_BATCH_SIZE 拆分并发请求，轮询开销随批次数而不是属性数增长。
+    下次轮询时间加入随机抖动，避免大量订阅同时到期；read() 走优先通道，立即触发一次调度。
+
+    参数:
+        api (mijiaAPI): API 实例
+        jitter (float): 轮询间隔的随机抖动比例，例如 0.1 表示 ±10%
+        coalesce (float): 提前合并即将到期属性的时间窗（秒）
+
+    示例:
+        >>> poller = PropertyPoller(api)
+        >>> poller.subscribe(did, "temperature", 60, lambda did, name, value: print(did, name, value))
+        >>> poller.subscribe(did, "on", 10)
+        >>> poller.start()
+        >>> poller.read(did, "on")  # 交互式读取，不等待下次调度
+        >>> poller.stats()  # 每个设备的轮询延迟
+    """
+    def __init__(self, api, jitter: float = 0.1, coalesce: float = 1.0):
+        self.api = api
+        self.jitter = jitter
+        self.coalesce = coalesce
+        self._subs: dict = {}
+        # (did, 属性名) -> 解析后的 {"did", "siid", "piid"}
+        self._methods: dict = {}
+        self._values: dict = {}
+        self._lag: dict = {}
+        self._priority: list = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def __enter__(self) -> "PropertyPoller":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _resolve(self, did: str, name: str) -> dict:
+        """通过设备规格将属性名解析为 siid/piid，结果按 (did, 属性名) 缓存"""
+        method = self._methods.get((str(did), name))
+        if method is not None:
+            return method
+        device = self.api.device_registry.get(did)
+        props = get_device_spec(device["model"], cache_path=self.api.auth_data_path.parent).props
+        if name not in props:
+            raise ValueError(f"不支持的属性: {name}, 可用属性: {list(props.keys())}")
+        prop = props[name]
+        if "r" not in prop.rw:
+            raise ValueError(f"属性 {name} 不可读取")
+        method = {"did": str(did), "siid": prop.method["siid"], "piid": prop.method["piid"]}
+        self._methods[(str(did), name)] = method
+        return method
+
+    def _next_due(self, now: float, interval: float) -> float:
+        return now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def subscribe(
+            self,
+            did: str,
+            name: str,
+            interval: float,
+            callback: Optional[Callable[[str, str, Any], None]] = None,
+    ) -> _SubscriptionHandle:
+        """
+        订阅属性
+
+        同一设备的同一属性（按 siid/piid）只轮询一次，多次订阅时使用其中最短的间隔。
+
+        参数:
+            did (str): 设备ID
+            name (str): 属性名称，'-' 与 '_' 等价
+            interval (float): 轮询间隔（秒）
+            callback (Optional[Callable]): 每次读到值时调用 callback(did, name, value)
+
+        返回值:
+            _SubscriptionHandle: 订阅句柄，用于 unsubscribe，key 属性为 (did, siid, piid)
+        """
+        method = self._resolve(did, name)
+        key = (method["did"], method["siid"], method["piid"])
+        with self._cond:
+            sub = self._subs.get(key)
+            if sub is None:
+                # 首次订阅立即轮询
+                sub = self._subs[key] = _Subscription(method["did"], name, method, interval, time.monotonic())
+            elif interval < sub.interval:
+                sub.interval = interval
+                sub.next_due = min(sub.next_due, time.monotonic() + interval)
+            handle = _SubscriptionHandle(key)
+            sub.handles[handle] = (interval, callback)
+            self._cond.notify()
+        return handle
+
+    def unsubscribe(self, handle: _SubscriptionHandle):
+        """取消一次订阅，同一属性的其他订阅不受影响，剩余订阅的最短间隔成为新的轮询间隔"""
+        with self._cond:
+            sub = self._subs.get(handle.key)
+            if sub is None or sub.handles.pop(handle, None) is None:
+                return
+            if not sub.handles:
+                del self._subs[handle.key]
+            else:
+                sub.interval = min(interval for interval, _ in sub.handles.values())
+
+    def latest(self, did: str, name: str) -> Optional[tuple]:
+        """返回最近一次轮询到的 (值, 时间戳)，尚未读取时返回 None"""
+        method = self._resolve(did, name)
+        return self._values.get((method["did"], method["siid"], method["piid"]))
+
+    def read(self, did: str, name: str, timeout: Optional[float] = 30.0) -> Any:
+        """
+        优先读取属性
+
+        请求进入优先通道并立即唤醒调度线程，与当前已到期的订阅合并为同一次请求；
+        调度线程未启动时直接在当前线程执行一次调度。
+        """
+        method = self._resolve(did, name)
+        future: Future = Future()
+        with self._cond:
+            self._priority.append((method, name, future))
+            self._cond.notify()
+            running = self._running
+        if not running:
+            self.poll_once()
+        return future.result(timeout)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="mijiaPoller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._priority:
+                    due = min((sub.next_due for sub in self._subs.values()), default=None)
+                    wait = None if due is None else due - time.monotonic()
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if not self._running:
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"属性轮询出错: {e}")
+
+    def _collect(self, now: float) -> tuple:
+        with self._cond:
+            priority, self._priority = self._priority, []
+            due = [(sub, sub.next_due) for sub in self._subs.values() if sub.next_due <= now + self.coalesce]
+            for sub, due_at in due:
+                sub.next_due = self._next_due(max(now, due_at), sub.interval)
+        return priority, due
+
+    def poll_once(self) -> int:
+        """
+        执行一次调度：合并优先读取与到期订阅，发起一次 get_devices_prop 调用
+
+        返回值:
+            int: 本次读取的属性数量
+        """
+        now = time.monotonic()
+        priority, due = self._collect(now)
+        if not priority and not due:
+            return 0
+        params = []
+        seen = set()
+        for method in [item[0] for item in priority] + [sub.method for sub, _ in due]:
+            key = (method["did"], method["siid"], method["piid"])
+            if key not in seen:
+                seen.add(key)
+                params.append(method)
+
+        try:
+            results = self.api.get_devices_prop(params)
+        except Exception as e:
+            for _, _, future in priority:
+                future.set_exception(e)
+            finished = time.monotonic()
+            for sub, due_at in due:
+                self._lag.setdefault(sub.did, _LagStats()).record(max(0.0, finished - due_at), ok=False)
+            raise
+        finished = time.monotonic()
+        timestamp = time.time()
+        result_map = {(str(ret.get("did")), ret.get("siid"), ret.get("piid")): ret for ret in results}
+
+        for method, name, future in priority:
+            ret = result_map.get((method["did"], method["siid"], method["piid"]), {"code": -1})
+            if ret.get("code", 0) != 0 or "value" not in ret:
+                future.set_exception(ValueError(f"读取属性失败: {method['did']} -> {name}, code: {ret.get('code')}"))
+            else:
+                future.set_result(ret["value"])
+
+        for sub, due_at in due:
+            key = (sub.did, sub.method["siid"], sub.method["piid"])
+            ret = result_map.get(key, {"code": -1})
+            ok = ret.get("code", 0) == 0 and "value" in ret
+            # 延迟 = 拿到结果的时间 - 计划到期时间，提前合并的属性不计负延迟
+            self._lag.setdefault(sub.did, _LagStats()).record(max(0.0, finished - due_at), ok)
+            if not ok:
+                logger.debug(f"轮询属性失败: {sub.did} -> {sub.name}, 结果: {ret}")
+                continue
+            self._values[key] = (ret["value"], timestamp)
+            for callback in sub.callbacks:
+                try:
+                    callback(sub.did, sub.name, ret["value"])
+                except Exception as e:
+                    logger.error(f"属性轮询回调出错: {e}")
+        for method, name, future in priority:
+            if future.done() and future.exception() is None:
+                self._values[(method["did"], method["siid"], method["piid"])] = (future.result(), timestamp)
+        logger.debug(f"轮询 {len(params)} 个属性（优先 {len(priority)} 个）")
+        return len(params)
+
+    def stats(self) -> dict:
+        """每个设备的轮询次数、失败次数与延迟（秒）"""
+        return {did: stats.to_dict() for did, stats in self._lag.items()}
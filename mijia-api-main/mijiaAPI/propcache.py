@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Optional
+
+
+# 设备离线
+OFFLINE_CODE = -704042011
+# 只读属性多为传感器读数，变化快
+SENSOR_TTL = 5.0
+# 可写属性多为开关、模式等配置，通常只因写入而变化
+CONFIG_TTL = 60.0
+# 未注册设备规格时的默认有效期
+DEFAULT_TTL = 10.0
+
+
+def property_ttl(prop) -> float:
+    """根据属性定义（DevProp）给出缓存有效期"""
+    return CONFIG_TTL if "w" in prop.rw else SENSOR_TTL
+
+
+def _prop_key(item: dict) -> tuple:
+    return str(item.get("did")), item.get("siid"), item.get("piid")
+
+
+class PropertyCache():
+    """
+    设备属性状态缓存
+
+    以 (did, siid, piid) 为键保存最近一次读取或写入成功的属性值：
+    get_devices_prop 的成功结果写入缓存，set_devices_prop 成功后更新缓存，
+    返回错误码的属性失效，设备离线（-704042011）时该设备的所有属性失效。
+    读取时指定 max_age 才会使用缓存，且不会超过属性自身的有效期（传感器短、配置项长）。
+
+    参数:
+        default_ttl (float): 未注册规格的属性的有效期（秒）
+    """
+    def __init__(self, default_ttl: float = DEFAULT_TTL):
+        self.default_ttl = default_ttl
+        self._entries: dict = {}
+        self._ttls: dict = {}
+        self._lock = threading.Lock()
+
+    def register(self, did: str, ttls: dict):
+        """注册设备各属性的有效期，ttls 为 (siid, piid) -> 秒，通常来自 DeviceSpec.ttls"""
+        with self._lock:
+            self._ttls[str(did)] = ttls
+
+    def ttl(self, key: tuple) -> float:
+        ttls = self._ttls.get(key[0])
+        if ttls is None:
+            return self.default_ttl
+        return ttls.get(key[1:], self.default_ttl)
+
+    def get(self, key: tuple, max_age: float) -> Optional[dict]:
+        """返回不早于 max_age 秒且未超过属性有效期的缓存结果，否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, stored_at = entry
+        if time.monotonic() - stored_at > min(max_age, self.ttl(key)):
+            return None
+        return dict(result)
+
+    def lookup(self, params: list, max_age: float) -> tuple:
+        """
+        按请求参数查找缓存
+
+        返回值:
+            tuple: (命中的结果 {参数下标: 结果}, 未命中的参数列表)
+        """
+        hits = {}
+        missing = []
+        for index, item in enumerate(params):
+            result = self.get(_prop_key(item), max_age)
+            if result is None:
+                missing.append(item)
+            else:
+                hits[index] = result
+        return hits, missing
+
+    def _offline(self, did: str):
+        for key in [key for key in self._entries if key[0] == did]:
+            del self._entries[key]
+
+    def store_results(self, results: list):
+        """记录 get_devices_prop 的结果"""
+        now = time.monotonic()
+        with self._lock:
+            for result in results:
+                key = _prop_key(result)
+                code = result.get("code", 0)
+                if code == 0 and "value" in result:
+                    # 保存副本，调用方之后修改返回的结果不会影响缓存
+                    self._entries[key] = (dict(result), now)
+                elif code == OFFLINE_CODE:
+                    self._offline(key[0])
+                else:
+                    self._entries.pop(key, None)
+
+    def store_writes(self, params: list, results: list):
+        """记录 set_devices_prop 的结果，写入成功的值直接更新缓存"""
+        values = {_prop_key(item): item.get("value") for item in params}
+        now = time.monotonic()
+        with self._lock:
+            for result in results:
+                key = _prop_key(result)
+                code = result.get("code", 0)
+                if code == 0 and key in values:
+                    self._entries[key] = ({"did": key[0], "siid": key[1], "piid": key[2],
+                                           "value": values[key], "code": 0}, now)
+                elif code == OFFLINE_CODE:
+                    self._offline(key[0])
+                else:
+                    self._entries.pop(key, None)
+
+    def invalidate(self, params: Optional[list] = None):
+        """使请求涉及的属性失效，params 为 None 时清空缓存"""
+        with self._lock:
+            if params is None:
+                self._entries.clear()
+                return
+            for item in params:
+                self._entries.pop(_prop_key(item), None)
+
+    def invalidate_device(self, did: str):
+        with self._lock:
+            self._offline(str(did))
+
+    def __len__(self) -> int:
+        return len(self._entries)
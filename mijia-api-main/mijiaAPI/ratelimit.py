@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Iterable, Optional
+
+from .logger import logger
+
+
+# 设备操作超时，通常说明请求过于频繁
+THROTTLE_CODES = {-704053036, -704083036}
+
+
+class TokenBucket():
+    """令牌桶，rate 为每秒补充的令牌数，burst 为桶容量"""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """取走一个令牌，返回需要等待的秒数；令牌不足时允许透支，由调用方等待补足"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter():
+    """
+    按接口和设备限流
+
+    每个 URI 和每个 did 各有一个令牌桶，只有预算耗尽时才会延迟请求；
+    服务器返回限流/超时错误码时，对应接口或设备进入指数退避，请求成功后退避逐步解除。
+
+    参数:
+        endpoint_rate (float): 每个接口每秒允许的请求数
+        endpoint_burst (float): 每个接口允许的突发请求数
+        device_rate (float): 每个设备每秒允许的请求数
+        device_burst (float): 每个设备允许的突发请求数
+        backoff (float): 首次退避时间（秒），之后每次翻倍
+        max_backoff (float): 最大退避时间（秒）
+    """
+    def __init__(
+            self,
+            endpoint_rate: float = 20.0,
+            endpoint_burst: float = 40.0,
+            device_rate: float = 5.0,
+            device_burst: float = 10.0,
+            backoff: float = 0.5,
+            max_backoff: float = 30.0,
+    ):
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_burst = endpoint_burst
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._buckets: dict = {}
+        self._backoff: dict = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: tuple) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if key[0] == "uri":
+                bucket = TokenBucket(self.endpoint_rate, self.endpoint_burst)
+            else:
+                bucket = TokenBucket(self.device_rate, self.device_burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    @staticmethod
+    def _keys(uri: str, dids: Iterable[str]) -> list:
+        return [("uri", uri)] + [("did", str(did)) for did in dict.fromkeys(dids)]
+
+    def reserve(self, uri: str, dids: Iterable[str] = ()) -> float:
+        """为一次请求预留预算，返回需要等待的秒数（同步客户端 sleep，异步客户端 await）"""
+        now = time.monotonic()
+        delay = 0.0
+        with self._lock:
+            for key in self._keys(uri, dids):
+                delay = max(delay, self._bucket(key).reserve(now))
+                state = self._backoff.get(key)
+                if state is not None:
+                    delay = max(delay, state[1] - now)
+        return delay
+
+    def acquire(self, uri: str, dids: Iterable[str] = ()) -> float:
+        delay = self.reserve(uri, dids)
+        if delay > 0:
+            logger.debug(f"限流等待 {delay:.3f}s: {uri}")
+            time.sleep(delay)
+        return delay
+
+    def _penalize(self, key: tuple, now: float):
+        state = self._backoff.get(key)
+        delay = self.backoff if state is None else min(state[0] * 2, self.max_backoff)
+        self._backoff[key] = (delay, now + delay)
+        logger.debug(f"触发限流退避 {delay:.3f}s: {key}")
+
+    def _relax(self, key: tuple):
+        state = self._backoff.get(key)
+        if state is None:
+            return
+        if state[0] <= self.backoff:
+            del self._backoff[key]
+        else:
+            self._backoff[key] = (state[0] / 2, state[1])
+
+    def record(self, uri: str, code: Optional[int] = 0, did: Optional[str] = None):
+        """记录一次请求（或批量请求中单个设备）的结果码"""
+        key = ("uri", uri) if did is None else ("did", str(did))
+        with self._lock:
+            if code in THROTTLE_CODES:
+                self._penalize(key, time.monotonic())
+            elif code == 0:
+                self._relax(key)
+
+    def record_timeout(self, uri: str):
+        with self._lock:
+            self._penalize(("uri", uri), time.monotonic())
+
+    def record_result(self, uri: str, result):
+        """记录成功响应，批量接口按结果中每个设备的 code 分别记录"""
+        self.record(uri, 0)
+        items = result if isinstance(result, list) else [result]
+        for item in items:
+            if isinstance(item, dict) and "did" in item and "code" in item:
+                self.record(uri, item["code"], did=item["did"])
+
+
+def request_dids(data: dict) -> list:
+    """从请求数据中提取涉及的设备 did"""
+    params = data.get("params", data)
+    if isinstance(params, dict):
+        params = [params]
+    if not isinstance(params, list):
+        return []
+    return [item["did"] for item in params if isinstance(item, dict) and "did" in item]
@@ -0,0 +1,175 @@
+import threading
+import time
+from typing import Optional
+
+from .errors import DeviceNotFoundError, MultipleDevicesFoundError
+from .logger import logger
+
+
+# get_shared_devices_list() 返回的设备以此 home_id 标记
+SHARED_HOME_ID = "shared"
+
+
+class _DeviceIndex():
+    """一组设备按 did 和名称建立的索引"""
+    __slots__ = ("by_did", "by_name", "loaded_at")
+
+    def __init__(self, devices: list = (), loaded_at: Optional[float] = None):
+        self.by_did: dict = {}
+        self.by_name: dict = {}
+        for device in devices:
+            did = str(device["did"])
+            if did in self.by_did:
+                continue
+            self.by_did[did] = device
+            self.by_name.setdefault(device.get("name"), []).append(device)
+        self.loaded_at = loaded_at
+
+
+class DeviceRegistry():
+    """
+    设备索引
+
+    缓存一次设备列表，按 did 和设备名称建立索引，供 mijiaDevice、CLI 等按需查找，
+    避免每次查找单个设备都重新下载全部设备列表。
+
+    自己的设备与共享设备分开索引：默认只查找自己的设备，与共享设备重名不会导致按名称查找失败；
+    查找时传入 include_shared=True（或创建时指定）才会额外查找共享设备，共享设备列表在首次需要时才获取。
+
+    参数:
+        api (mijiaAPI): API 实例
+        ttl (float): 索引有效期（秒），超时后下次查找时自动刷新
+        include_shared (bool): 查找与 refresh() 默认是否包含共享设备
+        min_refresh_interval (float): 查找未命中时触发刷新的最小间隔（秒），
+            间隔内的未命中直接抛出 DeviceNotFoundError，避免反复查找不存在的设备时频繁拉取设备列表
+    """
+    def __init__(self, api, ttl: float = 300.0, include_shared: bool = False, min_refresh_interval: float = 10.0):
+        self.api = api
+        self.ttl = ttl
+        self.include_shared = include_shared
+        self.min_refresh_interval = min_refresh_interval
+        self._owned = _DeviceIndex()
+        self._shared = _DeviceIndex()
+        self._lock = threading.RLock()
+
+    def _include_shared(self, include_shared: Optional[bool]) -> bool:
+        return self.include_shared if include_shared is None else include_shared
+
+    def _is_stale(self, index: _DeviceIndex) -> bool:
+        return index.loaded_at is None or time.monotonic() - index.loaded_at >= self.ttl
+
+    @property
+    def stale(self) -> bool:
+        return self._is_stale(self._owned)
+
+    def refresh(self, include_shared: Optional[bool] = None) -> list:
+        """重新获取设备列表并重建索引，返回获取到的设备列表"""
+        include_shared = self._include_shared(include_shared)
+        with self._lock:
+            devices = self.api.get_devices_list()
+            if include_shared:
+                devices = devices + self.api.get_shared_devices_list()
+            self.load(devices, include_shared=include_shared)
+            return devices
+
+    def _refresh_shared(self):
+        with self._lock:
+            self._shared = _DeviceIndex(self.api.get_shared_devices_list(), time.monotonic())
+
+    def load(self, devices: list, include_shared: bool = True):
+        """
+        使用已获取的设备列表重建索引，同一 did 以先出现的记录为准
+
+        home_id 为 "shared" 的设备进入共享设备索引；include_shared 为 False 表示 devices
+        不包含共享设备，此时只更新自己的设备索引，共享设备索引保持不变。
+        """
+        owned = [device for device in devices if device.get("home_id") != SHARED_HOME_ID]
+        now = time.monotonic()
+        with self._lock:
+            self._owned = _DeviceIndex(owned, now)
+            if include_shared:
+                self._shared = _DeviceIndex(
+                    [device for device in devices if device.get("home_id") == SHARED_HOME_ID], now
+                )
+        logger.debug(f"设备索引已更新，共 {len(self._owned.by_did)} 个设备，{len(self._shared.by_did)} 个共享设备")
+
+    def invalidate(self):
+        with self._lock:
+            self._owned.loaded_at = None
+            self._shared.loaded_at = None
+
+    def _ensure_loaded(self, include_shared: bool = False):
+        with self._lock:
+            if self._is_stale(self._owned):
+                self.refresh(include_shared=include_shared)
+            if include_shared and self._is_stale(self._shared):
+                self._refresh_shared()
+
+    def _refresh_on_miss(self, include_shared: bool) -> bool:
+        """查找未命中时刷新索引，距上次刷新不足 min_refresh_interval 时跳过，返回是否刷新"""
+        with self._lock:
+            loaded_at = self._owned.loaded_at
+            if loaded_at is not None and time.monotonic() - loaded_at < self.min_refresh_interval:
+                return False
+            self.refresh(include_shared=include_shared)
+            return True
+
+    def devices(self, include_shared: Optional[bool] = None) -> list:
+        include_shared = self._include_shared(include_shared)
+        self._ensure_loaded(include_shared)
+        devices = list(self._owned.by_did.values())
+        if include_shared:
+            devices.extend(device for did, device in self._shared.by_did.items() if did not in self._owned.by_did)
+        return devices
+
+    def _find_did(self, did: str, include_shared: bool) -> Optional[dict]:
+        device = self._owned.by_did.get(did)
+        if device is None and include_shared:
+            device = self._shared.by_did.get(did)
+        return device
+
+    def _find_name(self, name: str, include_shared: bool) -> list:
+        # 自己的设备优先，只有没有同名的自己的设备时才查找共享设备
+        matches = self._owned.by_name.get(name)
+        if not matches and include_shared:
+            matches = self._shared.by_name.get(name)
+        return matches or []
+
+    def get(self, did: str, include_shared: Optional[bool] = None) -> dict:
+        """按 did 查找设备，未找到时刷新一次索引后再查找（受 min_refresh_interval 限制）"""
+        include_shared = self._include_shared(include_shared)
+        self._ensure_loaded(include_shared)
+        device = self._find_did(str(did), include_shared)
+        if device is None and self._refresh_on_miss(include_shared):
+            device = self._find_did(str(did), include_shared)
+        if device is None:
+            raise DeviceNotFoundError(did)
+        return device
+
+    def find_by_name(self, name: str, include_shared: Optional[bool] = None) -> dict:
+        """按设备名称查找设备，未找到时刷新一次索引后再查找（受 min_refresh_interval 限制），名称重复时抛出 MultipleDevicesFoundError"""
+        include_shared = self._include_shared(include_shared)
+        self._ensure_loaded(include_shared)
+        matches = self._find_name(name, include_shared)
+        if not matches and self._refresh_on_miss(include_shared):
+            matches = self._find_name(name, include_shared)
+        if not matches:
+            raise DeviceNotFoundError(name)
+        if len(matches) > 1:
+            raise MultipleDevicesFoundError(f"找到多个 dev_name 为 '{name}' 的设备，请使用 did 参数指定具体设备或者修改设备名称以区分")
+        return matches[0]
+
+    def lookup(self, did: Optional[str] = None, name: Optional[str] = None, include_shared: Optional[bool] = None) -> dict:
+        """按 did（优先）或名称查找设备记录"""
+        if did is not None:
+            return self.get(did, include_shared=include_shared)
+        if name is not None:
+            return self.find_by_name(name, include_shared=include_shared)
+        raise ValueError("必须提供 did 或 dev_name 参数之一")
+
+    def __contains__(self, did: str) -> bool:
+        self._ensure_loaded(self.include_shared)
+        return self._find_did(str(did), self.include_shared) is not None
+
+    def __len__(self) -> int:
+        return len(self.devices())
@@ -0,0 +1,174 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from .logger import logger
+
+
+SPEC_STORE_NAME = "specs.db"
+# 后续版本新增的列，打开旧数据库时自动补齐
+_EXTRA_COLUMNS = {"etag": "TEXT", "last_modified": "TEXT"}
+
+_stores: dict = {}
+_stores_lock = threading.Lock()
+
+
+class SpecStore():
+    """
+    设备规格存储
+
+    所有型号的规格保存在同一个 SQLite 文件中，以 model 为主键，
+    查询时只反序列化请求的型号，替代以往每个型号一个 JSON 文件的缓存方式。
+    每条记录同时保存获取时间和 HTTP 校验信息（ETag/Last-Modified），用于过期后的条件请求。
+
+    参数:
+        path (Union[str, Path]): 数据库文件路径，或其所在目录（使用目录下的 specs.db）
+    """
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path)
+        if path.suffix != ".db":
+            path = path / SPEC_STORE_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            # WAL 允许 CLI 与 MCP worker 等多个进程同时读写
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS specs ("
+                "model TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, "
+                "etag TEXT, "
+                "last_modified TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(specs)")}
+            for column, column_type in _EXTRA_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE specs ADD COLUMN {column} {column_type}")
+
+    def get(self, model: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM specs WHERE model = ?", (model,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def get_entry(self, model: str) -> Optional[dict]:
+        """
+        获取规格及其缓存元数据
+
+        返回值:
+            Optional[dict]: 不存在时返回 None，否则包含以下字段：
+                - info (dict): 设备规格信息
+                - fetched_at (float): 最近一次获取或确认未变化的时间戳
+                - etag (Optional[str]): 服务器返回的 ETag
+                - last_modified (Optional[str]): 服务器返回的 Last-Modified
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at, etag, last_modified FROM specs WHERE model = ?", (model,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"info": json.loads(row[0]), "fetched_at": row[1], "etag": row[2], "last_modified": row[3]}
+
+    def put(
+            self,
+            model: str,
+            info: dict,
+            fetched_at: Optional[float] = None,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+    ):
+        data = json.dumps(info, ensure_ascii=False, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO specs (model, data, fetched_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                (model, data, time.time() if fetched_at is None else fetched_at, etag, last_modified),
+            )
+
+    def touch(
+            self,
+            model: str,
+            fetched_at: Optional[float] = None,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+    ):
+        """服务器确认规格未变化（304）时更新获取时间，新的校验信息为 None 时保留原值"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE specs SET fetched_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE model = ?",
+                (time.time() if fetched_at is None else fetched_at, etag, last_modified, model),
+            )
+
+    def delete(self, model: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM specs WHERE model = ?", (model,))
+
+    def models(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT model FROM specs ORDER BY model")]
+
+    def __contains__(self, model: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM specs WHERE model = ?", (model,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM specs").fetchone()[0]
+
+    def import_json_file(self, cache_file: Union[str, Path]) -> bool:
+        """导入旧版 get_device_info 生成的 {model}.json 缓存文件，非规格文件（如 auth.json）会被跳过"""
+        cache_file = Path(cache_file)
+        try:
+            with cache_file.open("r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(info, dict) or not {"name", "properties", "actions"} <= info.keys():
+            return False
+        self.put(cache_file.stem, info, fetched_at=cache_file.stat().st_mtime)
+        return True
+
+    def migrate_json_cache(self, directory: Union[str, Path], remove: bool = False) -> int:
+        """
+        将目录下旧版的 {model}.json 缓存文件导入到规格存储
+
+        参数:
+            directory (Union[str, Path]): 旧缓存目录
+            remove (bool): 导入成功后是否删除原 JSON 文件
+
+        返回值:
+            int: 导入的型号数量
+        """
+        count = 0
+        for cache_file in sorted(Path(directory).glob("*.json")):
+            if cache_file.stem in self:
+                continue
+            if self.import_json_file(cache_file):
+                count += 1
+                if remove:
+                    cache_file.unlink()
+        if count:
+            logger.debug(f"已从 {directory} 导入 {count} 个设备规格")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_spec_store(cache_path: Union[str, Path]) -> SpecStore:
+    """获取 cache_path 对应的 SpecStore，同一路径在进程内只打开一次"""
+    key = Path(cache_path).resolve()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SpecStore(key)
+        return store
@@ -0,0 +1,198 @@
+import time
+from typing import Optional
+
+from .statstore import parse_stat_value
+
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
+
+# resample 支持的周期（秒），月按自然月
+_FIXED_PERIODS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+_AGGREGATES = ("sum", "mean", "max", "min", "count")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("统计数据向量化解析需要安装 numpy，请执行 pip install \"mijiaAPI[numpy]\"")
+
+
+def decode_statistics(items: list) -> tuple:
+    """
+    将一次 get_statistics 的结果解析为 NumPy 数组
+
+    统计值形如 "[12.5]"，整体去掉方括号后一次性转换为 float64，不再逐条 eval；
+    个别无法解析的值逐条解析，仍无法解析时为 NaN。结果按时间升序，重复的时间戳只保留一个。
+
+    参数:
+        items (list): get_statistics 返回的列表，每项包含 value、time
+
+    返回值:
+        tuple: (时间戳 ndarray[int64], 数值 ndarray[float64])
+    """
+    _require_numpy()
+    if not items:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    ts = np.fromiter((item["time"] for item in items), dtype=np.int64, count=len(items))
+    raw = np.array([str(item.get("value", "")) for item in items])
+    first = np.char.partition(np.char.strip(raw, "[] "), ",")[:, 0]
+    try:
+        values = first.astype(np.float64)
+    except ValueError:
+        values = np.fromiter((parse_stat_value(item.get("value")) for item in items), dtype=np.float64, count=len(items))
+    ts, index = np.unique(ts, return_index=True)
+    return ts, values[index]
+
+
+class StatsFrame():
+    """
+    多设备统计数据
+
+    以三列 NumPy 数组（设备编号、时间戳、数值）保存多个设备的统计数据，
+    提供按周期重采样、按设备聚合和 Top-N 等向量化运算。需要安装可选依赖 numpy。
+
+    参数:
+        dids (list): 设备ID列表，device 列中的编号为其下标
+        device (ndarray): 每个数据点所属设备在 dids 中的下标
+        ts (ndarray): 时间戳（秒）
+        values (ndarray): 数值，NaN 表示缺失
+
+    示例:
+        >>> frame = StatsFrame.from_responses(dict(zip(dids, api.get_statistics(queries))))
+        >>> daily = frame.resample("day")
+        >>> frame.top(5)  # 耗电量最高的 5 个设备
+    """
+    def __init__(self, dids: list, device, ts, values):
+        _require_numpy()
+        self.dids = list(dids)
+        self.device = np.asarray(device, dtype=np.int64)
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, series: dict) -> "StatsFrame":
+        """由 {did: (时间戳, 数值)} 构建，数组可以是 ndarray 或 StatsStore 返回的 array（零拷贝）"""
+        _require_numpy()
+        dids = list(series)
+        parts = [(np.frombuffer(ts, dtype=np.int64) if not isinstance(ts, np.ndarray) else ts,
+                  np.frombuffer(values, dtype=np.float64) if not isinstance(values, np.ndarray) else values)
+                 for ts, values in series.values()]
+        if not parts:
+            return cls([], [], [], [])
+        device = np.repeat(np.arange(len(dids), dtype=np.int64), [len(ts) for ts, _ in parts])
+        return cls(dids, device, np.concatenate([ts for ts, _ in parts]), np.concatenate([v for _, v in parts]))
+
+    @classmethod
+    def from_responses(cls, responses: dict) -> "StatsFrame":
+        """由 {did: get_statistics 结果} 构建"""
+        return cls.from_arrays({did: decode_statistics(items) for did, items in responses.items()})
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __repr__(self) -> str:
+        return f"StatsFrame(devices={len(self.dids)}, points={len(self)})"
+
+    def _periods(self, period: str, tz_offset: Optional[int]) -> tuple:
+        """返回每个数据点所在周期的编号，以及由周期编号计算周期起点时间戳的函数"""
+        if tz_offset is None:
+            tz_offset = time.localtime().tm_gmtoff
+        local = self.ts + tz_offset
+        if period in _FIXED_PERIODS:
+            size = _FIXED_PERIODS[period]
+            # 周从周一开始（1970-01-01 为周四）
+            shift = 3 * 86400 if period == "week" else 0
+            return (local + shift) // size, lambda index: index * size - shift - tz_offset
+        if period in ("month", "year"):
+            unit = "M" if period == "month" else "Y"
+            index = local.astype("datetime64[s]").astype(f"datetime64[{unit}]").astype(np.int64)
+            return index, lambda index: index.astype(f"datetime64[{unit}]").astype("datetime64[s]").astype(np.int64) - tz_offset
+        raise ValueError(f"不支持的周期: {period}, 可选周期: hour, day, week, month, year")
+
+    def _aggregate(self, groups, how: str) -> tuple:
+        """按 groups（每个数据点的非负 int64 组编号）聚合，返回 (有数据的组, 聚合值)"""
+        if how not in _AGGREGATES:
+            raise ValueError(f"不支持的聚合方式: {how}, 可选: {', '.join(_AGGREGATES)}")
+        valid = ~np.isnan(self.values)
+        keys = None
+        if groups.max() < 4 * len(groups) + 1024:
+            # 组编号稠密时直接按编号计数，无需排序
+            size = int(groups.max()) + 1
+            inverse = groups
+        else:
+            keys, inverse = np.unique(groups, return_inverse=True)
+            inverse = inverse.ravel()
+            size = len(keys)
+        if valid.all():
+            index, values = inverse, self.values
+        else:
+            index, values = inverse[valid], self.values[valid]
+        counts = np.bincount(index, minlength=size).astype(np.float64)
+        if how == "count":
+            result = counts
+        elif how in ("sum", "mean"):
+            result = np.bincount(index, weights=values, minlength=size)
+            if how == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = result / counts
+        else:
+            result = np.full(size, -np.inf if how == "max" else np.inf)
+            ufunc = np.maximum if how == "max" else np.minimum
+            ufunc.at(result, index, values)
+            result[counts == 0] = np.nan
+        if keys is None:
+            present = counts > 0 if index is inverse else np.bincount(groups, minlength=size) > 0
+            keys = np.flatnonzero(present)
+            result = result[present]
+        return keys, result
+
+    def resample(self, period: str, how: str = "sum", tz_offset: Optional[int] = None) -> "StatsFrame":
+        """
+        按周期重采样，例如小时数据汇总为天、天数据汇总为月
+
+        参数:
+            period (str): hour、day、week、month 或 year，按本地时间划分
+            how (str): 聚合方式，sum、mean、max、min 或 count
+            tz_offset (Optional[int]): 可选，时区偏移（秒），默认使用本机当前时区
+
+        返回值:
+            StatsFrame: 每个设备每个周期一个数据点，时间戳为周期起点
+        """
+        if not len(self):
+            return StatsFrame(self.dids, [], [], [])
+        index, to_start = self._periods(period, tz_offset)
+        # (设备, 周期) 编码为一个非负 int64
+        origin = int(index.min())
+        width = int(index.max()) - origin + 1
+        keys, values = self._aggregate(self.device * width + (index - origin), how)
+        return StatsFrame(self.dids, keys // width, to_start(keys % width + origin), values)
+
+    def per_device(self, how: str = "sum") -> dict:
+        """按设备聚合，返回 {did: 值}，没有数据的设备为 NaN"""
+        result = dict.fromkeys(self.dids, float("nan"))
+        if len(self):
+            keys, values = self._aggregate(self.device, how)
+            for index, value in zip(keys.tolist(), values.tolist()):
+                result[self.dids[index]] = value
+        return result
+
+    def top(self, n: int = 10, how: str = "sum") -> list:
+        """按聚合值从大到小返回前 n 个设备 [(did, 值), ...]"""
+        totals = [(did, value) for did, value in self.per_device(how).items() if value == value]
+        totals.sort(key=lambda item: item[1], reverse=True)
+        return totals[:n]
+
+    def series(self, did: str) -> tuple:
+        """返回单个设备的 (时间戳, 数值)"""
+        mask = self.device == self.dids.index(did)
+        return self.ts[mask], self.values[mask]
+
+    def to_dict(self) -> dict:
+        """转换为 {did: [(时间戳, 数值), ...]}"""
+        result = {did: [] for did in self.dids}
+        for device, ts, value in zip(self.device.tolist(), self.ts.tolist(), self.values.tolist()):
+            result[self.dids[device]].append((ts, value))
+        return result
@@ -0,0 +1,122 @@
+from typing import Generator, Union
+
+from .logger import logger
+from .statstore import STATS_MAX_LIMIT, bucket_seconds, request_limit, split_range
+
+
+# 可选的统计粒度，从粗到细；选择时月按 28 天计，保证不粗于所需分辨率
+_GRANULARITIES = (
+    ("stat_month", 28 * 86400),
+    ("stat_week", 7 * 86400),
+    ("stat_day", 86400),
+    ("stat_hour", 3600),
+)
+_RESOLUTIONS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 28 * 86400}
+
+
+def choose_data_type(resolution: Union[str, int, float] = "day", v3: bool = True) -> str:
+    """
+    选择满足分辨率要求的最粗统计粒度
+
+    参数:
+        resolution (Union[str, int, float]): hour、day、week、month，或所需分辨率（秒）
+        v3 (bool): 是否使用 _v3 接口，较旧的设备需要设为 False
+
+    返回值:
+        str: data_type，例如 stat_day_v3；分辨率小于 1 小时时返回小时粒度
+    """
+    if isinstance(resolution, str):
+        if resolution not in _RESOLUTIONS:
+            raise ValueError(f"不支持的分辨率: {resolution}, 可选: {', '.join(_RESOLUTIONS)}，或以秒为单位的数值")
+        seconds = _RESOLUTIONS[resolution]
+    else:
+        seconds = resolution
+    data_type = next((name for name, span in _GRANULARITIES if span <= seconds), "stat_hour")
+    return data_type + "_v3" if v3 else data_type
+
+
+def plan_statistics(query: dict, limit: int = STATS_MAX_LIMIT) -> list:
+    """
+    将一个统计查询转换为 get_statistics 的请求列表
+
+    参数:
+        query (dict): 包含 did、key、time_start、time_end，以及以下可选字段：
+            - resolution (Union[str, int]): 所需分辨率，默认 day，参见 choose_data_type
+            - data_type (str): 直接指定统计类型，指定后忽略 resolution
+            - v3 (bool): 是否使用 _v3 接口，默认 True
+        limit (int): 单次请求的最大条目数
+
+    返回值:
+        list: 请求参数列表
+    """
+    data_type = query.get("data_type") or choose_data_type(query.get("resolution", "day"), query.get("v3", True))
+    return [{
+        "did": str(query["did"]),
+        "key": query["key"],
+        "data_type": data_type,
+        "limit": request_limit,
+        "time_start": start,
+        "time_end": end,
+    } for start, end, request_limit in split_range(data_type, query["time_start"], query["time_end"], limit)]
+
+
+def _resplit(request: dict, items: list) -> list:
+    """
+    结果被截断时将请求一分为二重新获取，返回新的请求列表；未截断时返回空列表
+
+    请求的 limit 比区间可能包含的周期数多一条（参见 request_limit），
+    只有返回条数达到请求的 limit 或服务器单次上限时才视为截断。
+    """
+    if not isinstance(items, list) or len(items) < min(request["limit"], STATS_MAX_LIMIT):
+        return []
+    start, end = request["time_start"], request["time_end"]
+    if end - start < bucket_seconds(request["data_type"]):
+        return []
+    middle = (start + end) // 2
+    return [{
+        **request,
+        "time_start": half_start,
+        "time_end": half_end,
+        "limit": request_limit(request["data_type"], half_start, half_end, request["limit"]),
+    } for half_start, half_end in ((start, middle), (middle + 1, end))]
+
+
+def stitch_statistics(parts: list) -> list:
+    """合并多个请求的结果，按时间升序，重复的时间戳只保留一个"""
+    merged = {}
+    for items in parts:
+        for item in items or []:
+            if "time" in item:
+                merged[int(item["time"])] = item
+    return [merged[ts] for ts in sorted(merged)]
+
+
+def fetch_rounds(queries: list, limit: int = STATS_MAX_LIMIT) -> Generator[list, list, list]:
+    """
+    统计查询的执行过程，与同步/异步客户端无关
+
+    每轮 yield 一批请求，调用方并发执行后 send 回结果；被截断的请求拆分后进入下一轮。
+    结束时返回与 queries 顺序一致的合并结果。
+    """
+    owners = []
+    batch = []
+    for index, query in enumerate(queries):
+        for request in plan_statistics(query, limit):
+            owners.append(index)
+            batch.append(request)
+    parts = [[] for _ in queries]
+    rounds = 0
+    while batch:
+        rounds += 1
+        results = yield batch
+        next_owners, next_batch = [], []
+        for owner, request, items in zip(owners, batch, results):
+            retry = _resplit(request, items)
+            if retry:
+                next_owners.extend([owner] * len(retry))
+                next_batch.extend(retry)
+            else:
+                parts[owner].append(items)
+        owners, batch = next_owners, next_batch
+    logger.debug(f"统计查询 {len(queries)} 个，共 {rounds} 轮请求")
+    return [stitch_statistics(items) for items in parts]
@@ -0,0 +1,304 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Optional, Union
+
+from .logger import logger
+
+
+STATS_STORE_NAME = "stats.db"
+# 单次请求的最大条目数
+STATS_MAX_LIMIT = 1000
+
+# 各统计粒度的桶宽（秒），月按 31 天计
+BUCKET_SECONDS = {
+    "stat_hour": 3600,
+    "stat_day": 86400,
+    "stat_week": 7 * 86400,
+    "stat_month": 31 * 86400,
+}
+
+
+def bucket_seconds(data_type: str) -> int:
+    """返回 data_type（含或不含 _v3 后缀）对应的桶宽"""
+    base = data_type[:-3] if data_type.endswith("_v3") else data_type
+    if base not in BUCKET_SECONDS:
+        raise ValueError(f"不支持的统计类型: {data_type}, 可选类型: {', '.join(BUCKET_SECONDS)}（可带 _v3 后缀）")
+    return BUCKET_SECONDS[base]
+
+
+def request_limit(data_type: str, time_start: int, time_end: int, limit: int = STATS_MAX_LIMIT) -> int:
+    """
+    返回请求 [time_start, time_end] 时使用的 limit
+
+    未对齐的区间最多触及 ceil(宽度 / 桶宽) + 1 个统计周期，再多留一条作为截断标记：
+    返回条数达到 limit 时结果才可能被截断，恰好填满区间的完整结果不会被误判为截断。
+    """
+    span = bucket_seconds(data_type)
+    return min(math.ceil((int(time_end) - int(time_start) + 1) / span) + 2, limit)
+
+
+def split_range(data_type: str, time_start: int, time_end: int, limit: int = STATS_MAX_LIMIT) -> list:
+    """
+    将 [time_start, time_end] 拆分为最少的首尾相接的区间，每个区间的请求 limit 不超过 limit
+
+    统计数据以周期起点为时间戳，区间之间既不重叠也没有空隙，因此每个周期恰好属于一个区间。
+
+    返回值:
+        list: [(start, end, limit), ...]，limit 由 request_limit 计算
+    """
+    span = bucket_seconds(data_type)
+    time_start, time_end = int(time_start), int(time_end)
+    # 首尾两个不完整的周期和截断标记各占一条，因此宽度按 limit - 2 个周期计算
+    width = max(limit - 2, 1) * span
+    ranges = []
+    start = time_start
+    while start <= time_end:
+        end = min(start + width - 1, time_end)
+        ranges.append((start, end, request_limit(data_type, start, end, limit)))
+        start = end + 1
+    return ranges
+
+
+def parse_stat_value(value) -> float:
+    """解析统计值（形如 "[12.5]" 的 JSON 字符串），无法解析时返回 NaN"""
+    try:
+        value = json.loads(value) if isinstance(value, str) else value
+        if isinstance(value, list):
+            value = value[0]
+        return float(value)
+    except (ValueError, TypeError, IndexError):
+        return math.nan
+
+
+def _merge_intervals(intervals: list) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _subtract_intervals(start: int, end: int, covered: list) -> list:
+    missing = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start - 1))
+        cursor = max(cursor, c_end + 1)
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+class _Series():
+    """一个 (did, key, data_type) 的时间序列：时间戳与数值分别保存在 array 中"""
+    __slots__ = ("ts", "values", "covered")
+
+    def __init__(self, ts: array, values: array, covered: list):
+        self.ts = ts
+        self.values = values
+        self.covered = covered
+
+    def merge(self, points: dict):
+        if not points:
+            return
+        merged = dict(zip(self.ts, self.values))
+        merged.update(points)
+        keys = sorted(merged)
+        self.ts = array("q", keys)
+        self.values = array("d", (merged[k] for k in keys))
+
+    def slice(self, start: int, end: int) -> tuple:
+        lo = bisect_left(self.ts, start)
+        hi = bisect_right(self.ts, end)
+        return self.ts[lo:hi], self.values[lo:hi]
+
+
+class StatsStore():
+    """
+    本地统计数据存储
+
+    以 (did, key, data_type) 为键保存已获取的统计数据，时间戳（int64）和数值（float64）
+    以列式 array 存入 SQLite，并记录已覆盖的时间范围。查询时只请求缺失的范围，
+    其余部分直接从本地读取；尚未结束的最新一个统计周期每次都会重新获取。
+
+    参数:
+        api (mijiaAPI): API 实例
+        path (Optional[Union[str, Path]]): 数据库文件路径或所在目录，默认为认证文件所在目录下的 stats.db
+
+    示例:
+        >>> store = StatsStore(api)
+        >>> ts, values = store.query("123456", "7.1", "stat_day_v3", time_start, time_end)
+    """
+    def __init__(self, api, path: Optional[Union[str, Path]] = None):
+        self.api = api
+        path = Path(path) if path is not None else api.auth_data_path.parent
+        if path.suffix != ".db":
+            path = path / STATS_STORE_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._series: dict = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS series ("
+                "did TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "data_type TEXT NOT NULL, "
+                "ts BLOB NOT NULL, "
+                "vals BLOB NOT NULL, "
+                "covered TEXT NOT NULL, "
+                "PRIMARY KEY (did, key, data_type))"
+            )
+
+    def _load(self, series_key: tuple) -> _Series:
+        series = self._series.get(series_key)
+        if series is not None:
+            return series
+        row = self._conn.execute(
+            "SELECT ts, vals, covered FROM series WHERE did = ? AND key = ? AND data_type = ?", series_key
+        ).fetchone()
+        ts, values = array("q"), array("d")
+        covered = []
+        if row is not None:
+            ts.frombytes(row[0])
+            values.frombytes(row[1])
+            covered = json.loads(row[2])
+        series = self._series[series_key] = _Series(ts, values, covered)
+        return series
+
+    def _save(self, series_key: tuple, series: _Series):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series (did, key, data_type, ts, vals, covered) VALUES (?, ?, ?, ?, ?, ?)",
+                (*series_key, series.ts.tobytes(), series.values.tobytes(), json.dumps(series.covered)),
+            )
+
+    def missing_ranges(self, did: str, key: str, data_type: str, time_start: int, time_end: int) -> list:
+        """返回 [time_start, time_end] 中尚未获取的时间范围列表 [(start, end), ...]"""
+        with self._lock:
+            series = self._load((str(did), key, data_type))
+            return _subtract_intervals(int(time_start), int(time_end), series.covered)
+
+    def _requests_for(self, did: str, key: str, data_type: str, time_start: int, time_end: int) -> list:
+        requests = []
+        for missing_start, missing_end in self.missing_ranges(did, key, data_type, time_start, time_end):
+            # 缺失范围超过单次请求上限时拆分，避免结果被截断
+            for start, end, limit in split_range(data_type, missing_start, missing_end):
+                requests.append({
+                    "did": str(did),
+                    "key": key,
+                    "data_type": data_type,
+                    "limit": limit,
+                    "time_start": start,
+                    "time_end": end,
+                })
+        return requests
+
+    def insert(self, query: dict, items: list, now: Optional[float] = None):
+        """
+        保存一次 get_statistics 请求的结果，并记录已覆盖的范围
+
+        最新一个统计周期可能尚未结束，不计入已覆盖范围；结果被 limit 截断时只记录实际返回的时间段。
+        """
+        series_key = (str(query["did"]), query["key"], query["data_type"])
+        span = bucket_seconds(query["data_type"])
+        now = time.time() if now is None else now
+        points = {}
+        for item in items or []:
+            if "time" in item:
+                points[int(item["time"])] = parse_stat_value(item.get("value"))
+        start, end = int(query["time_start"]), int(query["time_end"])
+        if points and len(points) >= min(query.get("limit", STATS_MAX_LIMIT), STATS_MAX_LIMIT):
+            start, end = max(start, min(points)), min(end, max(points))
+        end = min(end, int(now) - span)
+        with self._lock:
+            series = self._load(series_key)
+            series.merge(points)
+            if start <= end:
+                series.covered = _merge_intervals(series.covered + [[start, end]])
+            self._save(series_key, series)
+
+    def query_many(self, queries: list, refresh: bool = True, max_workers: Optional[int] = None) -> list:
+        """
+        批量查询多个时间序列
+
+        所有查询缺失的范围合并为一次 get_statistics 调用（并发请求），之后从本地读取结果。
+
+        参数:
+            queries (list): 查询列表，每项包含 did、key、data_type、time_start、time_end
+            refresh (bool): 是否请求缺失的范围，为 False 时只读取本地数据
+            max_workers (Optional[int]): 可选，最大并发请求数
+
+        返回值:
+            list: 与 queries 顺序一致的 (时间戳 array('q'), 数值 array('d'))
+        """
+        if refresh:
+            requests = [request for query in queries for request in self._requests_for(
+                query["did"], query["key"], query["data_type"], query["time_start"], query["time_end"])]
+            if requests:
+                logger.debug(f"统计数据增量请求 {len(requests)} 个")
+                results = self.api.get_statistics(requests, max_workers=max_workers)
+                for request, items in zip(requests, results):
+                    self.insert(request, items)
+        with self._lock:
+            return [
+                self._load((str(query["did"]), query["key"], query["data_type"])).slice(
+                    int(query["time_start"]), int(query["time_end"]))
+                for query in queries
+            ]
+
+    def query(
+            self,
+            did: str,
+            key: str,
+            data_type: str,
+            time_start: int,
+            time_end: int,
+            refresh: bool = True,
+    ) -> tuple:
+        """
+        查询单个时间序列，只请求本地缺失的范围
+
+        参数:
+            did (str): 设备ID
+            key (str): 统计数据的键，参见 mijiaAPI.get_statistics
+            data_type (str): 统计数据类型，例如 stat_day_v3
+            time_start (int): 开始时间戳（秒）
+            time_end (int): 结束时间戳（秒）
+            refresh (bool): 是否请求缺失的范围，为 False 时只读取本地数据
+
+        返回值:
+            tuple: (时间戳 array('q'), 数值 array('d'))，按时间升序
+        """
+        query = {"did": did, "key": key, "data_type": data_type, "time_start": time_start, "time_end": time_end}
+        return self.query_many([query], refresh=refresh)[0]
+
+    def clear(self, did: Optional[str] = None):
+        """删除本地数据，did 为 None 时删除全部"""
+        with self._lock, self._conn:
+            if did is None:
+                self._series.clear()
+                self._conn.execute("DELETE FROM series")
+            else:
+                for series_key in [k for k in self._series if k[0] == str(did)]:
+                    del self._series[series_key]
+                self._conn.execute("DELETE FROM series WHERE did = ?", (str(did),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from .logger import logger
+
+
+DEVICE_SNAPSHOT_NAME = "device_snapshot.json"
+DEVICE_CHANGES_NAME = "device_changes.jsonl"
+
+
+def _device_state(device: dict, room_id: Optional[str]) -> dict:
+    """提取需要比较变化的字段"""
+    extra = device.get("extra") or {}
+    return {
+        "name": device.get("name"),
+        "model": device.get("model"),
+        "home_id": device.get("home_id"),
+        "room_id": room_id,
+        "isOnline": device.get("isOnline"),
+        "fw_version": extra.get("fw_version") if isinstance(extra, dict) else None,
+    }
+
+
+class DeviceDelta():
+    """
+    两次同步之间的设备变化
+
+    属性:
+        added (list): 新增设备的完整记录
+        removed (list): 被移除设备的最后状态（含 did）
+        renamed (list): {"did", "old", "new"}，设备名称变化
+        moved (list): {"did", "old": {"home_id", "room_id"}, "new": {...}}，所属家庭或房间变化
+        online (list): {"did", "name", "isOnline"}，在线状态变化
+        firmware (list): {"did", "name", "old", "new"}，固件版本变化
+        synced_at (float): 本次同步时间戳
+    """
+    __slots__ = ("added", "removed", "renamed", "moved", "online", "firmware", "synced_at")
+    KINDS = ("added", "removed", "renamed", "moved", "online", "firmware")
+
+    def __init__(self, synced_at: Optional[float] = None):
+        for kind in self.KINDS:
+            setattr(self, kind, [])
+        self.synced_at = time.time() if synced_at is None else synced_at
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, kind) for kind in self.KINDS)
+
+    def to_dict(self) -> dict:
+        return {"synced_at": self.synced_at, **{kind: getattr(self, kind) for kind in self.KINDS}}
+
+    def __repr__(self) -> str:
+        counts = ", ".join(f"{kind}={len(getattr(self, kind))}" for kind in self.KINDS if getattr(self, kind))
+        return f"DeviceDelta({counts or 'unchanged'})"
+
+
+class DeviceSync():
+    """
+    设备列表增量同步
+
+    保存上一次看到的设备快照（按 did），每次 refresh() 时与最新设备列表比较，
+    生成 DeviceDelta（新增、移除、改名、移动家庭/房间、上下线、固件更新），
+    通知订阅者并持久化，进程重启后仍能与上次的快照比较。
+    刷新得到的设备列表会同步到 api.device_registry。
+
+    参数:
+        api (mijiaAPI): API 实例
+        path (Optional[Union[str, Path]]): 快照保存目录，默认为认证文件所在目录；为 False 时不持久化
+        include_shared (bool): 是否包含共享设备
+
+    示例:
+        >>> sync = DeviceSync(api)
+        >>> sync.subscribe(lambda delta: print(delta.online))
+        >>> delta = sync.refresh()
+    """
+    def __init__(
+            self,
+            api,
+            path: Optional[Union[str, Path, bool]] = None,
+            include_shared: bool = True,
+    ):
+        self.api = api
+        self.include_shared = include_shared
+        if path is False:
+            self.path = None
+        else:
+            self.path = Path(path) if path is not None else api.auth_data_path.parent
+        self.snapshot: dict = {}
+        self.synced_at: Optional[float] = None
+        self._subscribers: list = []
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def snapshot_file(self) -> Optional[Path]:
+        return None if self.path is None else self.path / DEVICE_SNAPSHOT_NAME
+
+    @property
+    def changes_file(self) -> Optional[Path]:
+        return None if self.path is None else self.path / DEVICE_CHANGES_NAME
+
+    def _load(self):
+        if self.snapshot_file is None or not self.snapshot_file.exists():
+            return
+        try:
+            with self.snapshot_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"设备快照读取失败，将重新同步: {e}")
+            return
+        if not isinstance(data, dict) or not isinstance(data.get("devices"), dict):
+            logger.warning(f"设备快照格式不正确，将重新同步: {self.snapshot_file}")
+            return
+        self.snapshot = data["devices"]
+        self.synced_at = data.get("synced_at")
+
+    def _save(self, delta: DeviceDelta):
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.snapshot_file.with_suffix(".tmp")
+        with tmp_file.open("w", encoding="utf-8") as f:
+            json.dump({"synced_at": self.synced_at, "devices": self.snapshot}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.snapshot_file)
+        if delta:
+            with self.changes_file.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(delta.to_dict(), ensure_ascii=False) + "\n")
+
+    def subscribe(self, callback: Callable[[DeviceDelta], None]) -> Callable[[], None]:
+        """订阅设备变化，仅在有变化时调用 callback(delta)，返回取消订阅的函数"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _fetch(self) -> tuple:
+        """获取设备列表，以及 did -> room_id 映射（来自家庭信息中的 roomlist）"""
+        homes = self.api.get_homes_list()
+        rooms = {}
+        devices = []
+        for home in homes:
+            for room in home.get("roomlist") or []:
+                for did in room.get("dids") or []:
+                    rooms[str(did)] = str(room["id"])
+            devices.extend(self.api.iter_devices(home["id"]))
+        if self.include_shared:
+            devices.extend(self.api.get_shared_devices_list())
+        return devices, rooms
+
+    def refresh(self) -> DeviceDelta:
+        """重新获取设备列表并返回与上次快照的差异"""
+        devices, rooms = self._fetch()
+        with self._lock:
+            delta = self.apply(devices, rooms)
+            subscribers = list(self._subscribers)
+        self._update_registry(devices)
+        if delta:
+            logger.debug(f"设备列表变化: {delta}")
+            for callback in subscribers:
+                try:
+                    callback(delta)
+                except Exception as e:
+                    logger.error(f"设备变化订阅回调出错: {e}")
+        return delta
+
+    def _update_registry(self, devices: list):
+        """
+        把刷新得到的设备列表同步到 api.device_registry
+
+        自己的设备索引总是更新；共享设备索引与自己的设备分开保存（默认不参与查找），
+        只在本次同步包含共享设备时更新，否则保持不变，不会清空注册表中的共享设备。
+        """
+        self.api.device_registry.load(devices, include_shared=self.include_shared)
+
+    def apply(self, devices: list, rooms: Optional[dict] = None) -> DeviceDelta:
+        """用已获取的设备列表更新快照并返回差异（不发起网络请求，不通知订阅者）"""
+        rooms = rooms or {}
+        with self._lock:
+            delta = DeviceDelta()
+            current = {}
+            for device in devices:
+                did = str(device["did"])
+                if did in current:
+                    continue
+                current[did] = state = _device_state(device, rooms.get(did))
+                old = self.snapshot.get(did)
+                if old is None:
+                    delta.added.append(device)
+                    continue
+                if old["name"] != state["name"]:
+                    delta.renamed.append({"did": did, "old": old["name"], "new": state["name"]})
+                if (old["home_id"], old["room_id"]) != (state["home_id"], state["room_id"]):
+                    delta.moved.append({
+                        "did": did,
+                        "old": {"home_id": old["home_id"], "room_id": old["room_id"]},
+                        "new": {"home_id": state["home_id"], "room_id": state["room_id"]},
+                    })
+                if old["isOnline"] != state["isOnline"]:
+                    delta.online.append({"did": did, "name": state["name"], "isOnline": state["isOnline"]})
+                if old["fw_version"] != state["fw_version"]:
+                    delta.firmware.append({"did": did, "name": state["name"], "old": old["fw_version"], "new": state["fw_version"]})
+            delta.removed = [{"did": did, **state} for did, state in self.snapshot.items() if did not in current]
+            self.snapshot = current
+            self.synced_at = delta.synced_at
+            self._save(delta)
+        return delta
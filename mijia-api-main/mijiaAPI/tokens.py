@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Optional
+
+
+# serviceToken 失效时服务器返回的错误码（含 HTTP 状态码）
+AUTH_ERROR_CODES = {2, 3, 401, 403, -10020, -10030}
+
+REQUIRED_AUTH_KEYS = ("ua", "ssecurity", "userId", "cUserId", "serviceToken")
+
+
+class TokenState():
+    """
+    本地跟踪 serviceToken 的有效状态
+
+    任意请求成功后将 Token 标记为已验证，在 valid_window 秒内无需再次校验；
+    只有本地判断 Token 缺失/过期，或者服务器返回鉴权错误时才需要刷新。
+    """
+    def __init__(self, auth_data: dict, valid_window: float = 300.0):
+        self.auth_data = auth_data
+        self.valid_window = valid_window
+        self.validated_at: Optional[float] = None
+        # 每次成功刷新 Token 后递增，用于并发请求同时遇到鉴权错误时只刷新一次
+        self.generation = 0
+        self.lock = threading.RLock()
+
+    @property
+    def has_credentials(self) -> bool:
+        if not self.auth_data:
+            return False
+        return all(key in self.auth_data for key in REQUIRED_AUTH_KEYS)
+
+    @property
+    def expired(self) -> bool:
+        expire_time = self.auth_data.get("expireTime")
+        if expire_time is None:
+            return False
+        return int(expire_time) <= int(time.time() * 1000)
+
+    @property
+    def usable(self) -> bool:
+        """本地判断 Token 是否可以直接使用，不发起网络请求"""
+        return self.has_credentials and not self.expired
+
+    def is_fresh(self) -> bool:
+        if self.validated_at is None or not self.usable:
+            return False
+        return time.monotonic() - self.validated_at < self.valid_window
+
+    def mark_valid(self):
+        self.validated_at = time.monotonic()
+
+    def mark_refreshed(self):
+        self.generation += 1
+        self.mark_valid()
+
+    def invalidate(self):
+        self.validated_at = None
+
+    @staticmethod
+    def is_auth_error(code) -> bool:
+        try:
+            return int(code) in AUTH_ERROR_CODES
+        except (TypeError, ValueError):
+            return False
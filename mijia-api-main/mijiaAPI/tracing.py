@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("mijia_span", default=None)
+
+
+def _task_id() -> int:
+    """当前线程，或在 asyncio 任务中时当前任务的标识，用作 trace 中的 tid"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Span():
+    """
+    一段计时区间
+
+    属性:
+        name (str): 名称，例如 request、sign、http
+        args (dict): 附加信息，例如 uri、model；with 块内可继续添加
+        parent (Optional[Span]): 外层区间
+        start (float): 开始时间（time.perf_counter）
+        end (Optional[float]): 结束时间
+        error (Optional[str]): 区间内抛出的异常
+    """
+    __slots__ = ("tracer", "name", "args", "parent", "span_id", "tid", "start", "end", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.parent = _current_span.get()
+        self.span_id = next(tracer._ids)
+        self.tid = _task_id()
+        self.start = 0.0
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        self.tracer._emit("on_start", self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc is not None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.tracer._emit("on_end", self)
+
+
+class _NoopSpan():
+    """没有注册钩子时使用的空区间，不计时"""
+    __slots__ = ()
+
+    @property
+    def args(self) -> dict:
+        # 每次返回新的字典，写入的附加信息直接丢弃
+        return {}
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class SpanHook():
+    """区间钩子基类，按需重写 on_start / on_end"""
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+
+class Tracer():
+    """
+    请求生命周期追踪
+
+    库内各阶段（_request 的 Token 检查、签名、HTTP 发送、解密、解析，get_device_info、
+    _get_location、分页请求等）都包裹在 tracer.span() 中，嵌套关系通过 contextvars 维护，
+    同时适用于线程和 asyncio。没有注册钩子时 span() 返回空区间，几乎没有开销。
+    """
+    def __init__(self):
+        self._hooks: tuple = ()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._hooks)
+
+    def add_hook(self, hook: SpanHook) -> Callable[[], None]:
+        """注册钩子，返回移除该钩子的函数"""
+        with self._lock:
+            self._hooks = self._hooks + (hook,)
+
+        def remove():
+            with self._lock:
+                self._hooks = tuple(h for h in self._hooks if h is not hook)
+        return remove
+
+    def span(self, name: str, /, **args) -> Union[Span, _NoopSpan]:
+        if not self._hooks:
+            return _NOOP_SPAN
+        return Span(self, name, args)
+
+    def _emit(self, method: str, span: Span):
+        for hook in self._hooks:
+            try:
+                getattr(hook, method)(span)
+            except Exception:
+                # 钩子出错不影响请求本身
+                pass
+
+
+tracer = Tracer()
+
+
+class ChromeTraceExporter(SpanHook):
+    """
+    将区间导出为 Chrome trace-event JSON，可在 Perfetto（ui.perfetto.dev）或 chrome://tracing 中打开
+
+    参数:
+        tracer (Tracer): 要记录的 Tracer，默认为全局 tracer
+
+    示例:
+        >>> with ChromeTraceExporter() as trace:
+        ...     device = mijiaDevice(api, dev_name="台灯")
+        >>> trace.save("trace.json")
+    """
+    def __init__(self, tracer: Tracer = tracer):
+        self.tracer = tracer
+        self.events: list = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._tids: dict = {}
+        self._lock = threading.Lock()
+        self._remove: Optional[Callable[[], None]] = None
+
+    def start(self) -> "ChromeTraceExporter":
+        if self._remove is None:
+            self._remove = self.tracer.add_hook(self)
+        return self
+
+    def stop(self):
+        if self._remove is not None:
+            self._remove()
+            self._remove = None
+
+    def __enter__(self) -> "ChromeTraceExporter":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def on_end(self, span: Span):
+        args = {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                for key, value in span.args.items()}
+        if span.parent is not None:
+            args["parent"] = span.parent.span_id
+        if span.error is not None:
+            args["error"] = span.error
+        with self._lock:
+            # tid 按出现顺序编号，便于在 Perfetto 中查看
+            tid = self._tids.setdefault(span.tid, len(self._tids) + 1)
+            self.events.append({
+                "name": span.name,
+                "cat": "mijiaAPI",
+                "ph": "X",
+                "ts": (span.start - self._origin) * 1e6,
+                "dur": (span.end - span.start) * 1e6,
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"id": span.span_id, **args},
+            })
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
@@ -0,0 +1,50 @@
+import unittest
+
+from mijiaAPI.devices import DevProp, SpecIndex
+
+
+def make_prop(name: str, piid: int, prop_type: str = "int", value_range=None) -> DevProp:
+    return DevProp({
+        "name": name,
+        "description": name,
+        "type": prop_type,
+        "rw": "rw",
+        "unit": None,
+        "range": value_range,
+        "method": {"siid": 2, "piid": piid},
+    })
+
+
+class SpecIndexTest(unittest.TestCase):
+    def test_dash_and_underscore_are_equivalent(self):
+        index = SpecIndex([make_prop("color-temperature", 1)])
+        self.assertIs(index["color_temperature"], index["color-temperature"])
+        self.assertIn("color_temperature", index)
+        self.assertEqual(list(index), ["color-temperature"])
+
+    def test_colliding_names_keep_both_properties(self):
+        dashed = make_prop("a-b", 1)
+        underscored = make_prop("a_b", 2)
+        index = SpecIndex([dashed, underscored])
+        self.assertIs(index["a-b"], dashed)
+        self.assertIs(index["a_b"], underscored)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index), ["a-b", "a_b"])
+
+    def test_ambiguous_normalized_name_is_not_resolved(self):
+        index = SpecIndex([make_prop("a-b-c", 1), make_prop("a_b-c", 2)])
+        self.assertNotIn("a_b_c", index)
+        with self.assertRaises(KeyError):
+            index["a_b_c"]
+
+
+class DevPropTest(unittest.TestCase):
+    def test_compiled_validator(self):
+        prop = make_prop("brightness", 1, value_range=[1, 100, 1])
+        self.assertEqual(prop.check("50"), 50)
+        with self.assertRaises(ValueError):
+            prop.check(101)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from mijiaAPI.errors import DeviceNotFoundError, MultipleDevicesFoundError
+from mijiaAPI.registry import DeviceRegistry
+
+
+class FakeAPI():
+    def __init__(self, owned: list, shared: list):
+        self.owned = owned
+        self.shared = shared
+        self.calls = {"owned": 0, "shared": 0}
+
+    def get_devices_list(self) -> list:
+        self.calls["owned"] += 1
+        return list(self.owned)
+
+    def get_shared_devices_list(self) -> list:
+        self.calls["shared"] += 1
+        return list(self.shared)
+
+
+class DeviceRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeAPI(
+            owned=[{"did": "1", "name": "台灯", "model": "a", "home_id": "100"}],
+            shared=[
+                {"did": "2", "name": "台灯", "model": "b", "home_id": "shared"},
+                {"did": "3", "name": "空调", "model": "c", "home_id": "shared"},
+            ],
+        )
+        self.registry = DeviceRegistry(self.api)
+
+    def test_name_lookup_skips_shared_duplicates(self):
+        self.assertEqual(self.registry.find_by_name("台灯")["did"], "1")
+        self.assertEqual(self.api.calls["shared"], 0)
+
+    def test_owned_device_wins_when_shared_requested(self):
+        self.assertEqual(self.registry.find_by_name("台灯", include_shared=True)["did"], "1")
+        self.assertEqual(self.registry.find_by_name("空调", include_shared=True)["did"], "3")
+
+    def test_shared_devices_only_when_requested(self):
+        with self.assertRaises(DeviceNotFoundError):
+            self.registry.lookup(did="3")
+        self.assertEqual(self.registry.lookup(did="3", include_shared=True)["model"], "c")
+
+    def test_duplicate_names_within_owned_devices(self):
+        self.api.owned.append({"did": "4", "name": "台灯", "model": "d", "home_id": "100"})
+        with self.assertRaises(MultipleDevicesFoundError):
+            self.registry.find_by_name("台灯")
+
+    def test_miss_refresh_is_rate_limited(self):
+        self.registry.devices()
+        for _ in range(3):
+            with self.assertRaises(DeviceNotFoundError):
+                self.registry.get("404")
+        self.assertEqual(self.api.calls["owned"], 1)
+
+    def test_load_without_shared_keeps_shared_index(self):
+        self.registry.refresh(include_shared=True)
+        self.registry.load(self.api.owned, include_shared=False)
+        self.assertEqual(self.registry.get("3", include_shared=True)["name"], "空调")
+        self.assertEqual(self.api.calls["shared"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
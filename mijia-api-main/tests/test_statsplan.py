@@ -0,0 +1,68 @@
+import unittest
+
+from mijiaAPI.statsplan import _resplit, fetch_rounds, plan_statistics
+from mijiaAPI.statstore import STATS_MAX_LIMIT, request_limit, split_range
+
+
+HOUR = 3600
+
+
+def serve(requests: list) -> list:
+    """模拟服务器：返回区间触及的每个小时周期（以周期起点为时间戳），最多 limit 条"""
+    results = []
+    for request in requests:
+        first = request["time_start"] // HOUR * HOUR
+        times = list(range(first, request["time_end"] + 1, HOUR))
+        results.append([{"time": t, "value": "[1]"} for t in times[:request["limit"]]])
+    return results
+
+
+def run(queries: list, limit: int = STATS_MAX_LIMIT) -> tuple:
+    rounds = fetch_rounds(queries, limit)
+    sent = []
+    try:
+        batch = next(rounds)
+        while True:
+            sent.append(batch)
+            batch = rounds.send(serve(batch))
+    except StopIteration as e:
+        return e.value, sent
+
+
+class StatsPlanTest(unittest.TestCase):
+    def test_full_unaligned_window_is_not_resplit(self):
+        # 从 00:30 到 03:29:59 触及 4 个小时周期，即 ceil(3h / 1h) + 1
+        query = {"did": "1", "key": "power", "data_type": "stat_hour_v3",
+                 "time_start": 1800, "time_end": 1800 + 3 * HOUR - 1}
+        results, sent = run([query])
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(len(sent[0]), 1)
+        self.assertEqual(len(results[0]), 4)
+
+    def test_truncated_window_is_resplit_with_own_limits(self):
+        query = {"did": "1", "key": "power", "data_type": "stat_hour_v3",
+                 "time_start": 0, "time_end": 100 * HOUR - 1}
+        request = dict(plan_statistics(query)[0], time_end=8 * HOUR - 1, limit=8)
+        retry = _resplit(request, serve([request])[0])
+        self.assertEqual([(half["time_start"], half["time_end"]) for half in retry],
+                         [(0, 4 * HOUR - 1), (4 * HOUR, 8 * HOUR - 1)])
+        for half in retry:
+            self.assertEqual(half["limit"], request_limit(half["data_type"], half["time_start"], half["time_end"]))
+            self.assertEqual(half["limit"], 6)
+
+    def test_truncated_query_completes(self):
+        query = {"did": "1", "key": "power", "data_type": "stat_hour_v3",
+                 "time_start": 0, "time_end": 100 * HOUR - 1}
+        results, sent = run([query], limit=10)
+        self.assertEqual([item["time"] for item in results[0]], list(range(0, 100 * HOUR, HOUR)))
+        self.assertEqual(len(sent), 1)
+
+    def test_split_range_leaves_room_for_truncation_marker(self):
+        for start, end, limit in split_range("stat_hour_v3", 1800, 1800 + 5000 * HOUR, 100):
+            self.assertLessEqual(limit, 100)
+            touched = (end // HOUR) - (start // HOUR) + 1
+            self.assertLess(touched, limit)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from mijiaAPI.registry import DeviceRegistry
+from mijiaAPI.sync import DeviceSync
+
+
+class FakeAPI():
+    def __init__(self):
+        self.auth_data_path = None
+        self.owned = [{"did": "1", "name": "台灯", "model": "a", "home_id": "100"}]
+        self.shared = [{"did": "2", "name": "空调", "model": "b", "home_id": "shared"}]
+        self.device_registry = DeviceRegistry(self)
+
+    def get_homes_list(self) -> list:
+        return [{"id": "100", "roomlist": []}]
+
+    def iter_devices(self, home_id: str):
+        return iter(self.owned)
+
+    def get_devices_list(self) -> list:
+        return list(self.owned)
+
+    def get_shared_devices_list(self) -> list:
+        return list(self.shared)
+
+
+class DeviceSyncRegistryTest(unittest.TestCase):
+    def test_sync_without_shared_keeps_shared_index(self):
+        api = FakeAPI()
+        api.device_registry.refresh(include_shared=True)
+        DeviceSync(api, path=False, include_shared=False).refresh()
+        self.assertEqual(api.device_registry.get("2", include_shared=True)["name"], "空调")
+
+    def test_sync_with_shared_does_not_affect_owned_lookups(self):
+        api = FakeAPI()
+        api.shared.append({"did": "3", "name": "台灯", "model": "c", "home_id": "shared"})
+        DeviceSync(api, path=False).refresh()
+        self.assertEqual(api.device_registry.find_by_name("台灯")["did"], "1")
+        self.assertEqual(api.device_registry.get("3", include_shared=True)["model"], "c")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from __future__ import annotations
 import json
 import os
 import sys
+import threading
 from contextlib import redirect_stdout
 from dataclasses import dataclass
 from pathlib import Path
@@ -15,6 +16,7 @@ try:
     from mijiaAPI import (
         mijiaAPI,
         mijiaDevice,
+        DeviceSync,
         APIError,
         DeviceActionError,
         DeviceGetError,
@@ -24,7 +26,9 @@ try:
         LoginError,
         MultipleDevicesFoundError,
         get_device_info,
+        warm_spec_cache,
     )
+    from mijiaAPI.specstore import open_spec_store
 
     MIJIA_API_AVAILABLE = True
 except ImportError:
@@ -123,13 +127,16 @@ class MijiaController:
         self,
         auth_path: Optional[str] = None,
         use_mock: Optional[bool] = None,
-        sleep_time: float = 0.5,
+        sleep_time: float = 0.0,
     ) -> None:
         self.use_mock = _to_bool(use_mock, default=os.getenv("MIJIA_USE_MOCK", "0") in {"1", "true", "yes"})
         self.auth_path = _resolve_auth_path(auth_path)
         self.sleep_time = sleep_time
         self._api: Optional[mijiaAPI] = None
         self._home_map: Optional[Dict[str, Dict[str, Any]]] = None
+        self._device_sync: Optional[DeviceSync] = None
+        # worker 会并发调用同一个 controller，懒加载的登录态需要串行初始化
+        self._init_lock = threading.Lock()
 
     # region 初始化
     def _ensure_api(self) -> mijiaAPI:
@@ -137,19 +144,20 @@ class MijiaController:
             raise RuntimeError("当前处于 MOCK 模式，无法执行真实 API 调用")
         if not MIJIA_API_AVAILABLE:
             raise RuntimeError("未检测到 mijiaAPI，请先执行 pip install -r python_scripts/requirements.txt")
-        if self._api is None:
-            auth_file = Path(self.auth_path)
-            if not auth_file.exists():
-                raise RuntimeError(
-                    "未找到米家认证文件，请先在终端执行 `python -m mijiaAPI -l` 扫码登录"
-                )
-            api = mijiaAPI(self.auth_path)
-            try:
-                with redirect_stdout(sys.stderr):
-                    api.login()
-            except LoginError as exc:  # type: ignore[arg-type]
-                raise RuntimeError("米家登录失败，请重新在终端扫码登录：python -m mijiaAPI -l") from exc
-            self._api = api
+        with self._init_lock:
+            if self._api is None:
+                auth_file = Path(self.auth_path)
+                if not auth_file.exists():
+                    raise RuntimeError(
+                        "未找到米家认证文件，请先在终端执行 `python -m mijiaAPI -l` 扫码登录"
+                    )
+                api = mijiaAPI(self.auth_path)
+                try:
+                    with redirect_stdout(sys.stderr):
+                        api.login()
+                except LoginError as exc:  # type: ignore[arg-type]
+                    raise RuntimeError("米家登录失败，请重新在终端扫码登录：python -m mijiaAPI -l") from exc
+                self._api = api
         return self._api
 
 
@@ -192,6 +200,20 @@ class MijiaController:
             device["home_name"] = _select_home_name(home_map, device.get("home_id"))
         return devices
 
+    def sync_devices(self) -> Dict[str, Any]:
+        if self.use_mock:
+            return {"changed": False, "total": len(MOCK_DEVICES), "delta": None}
+        api = self._ensure_api()
+        with self._init_lock:
+            if self._device_sync is None:
+                self._device_sync = DeviceSync(api, path=Path(self.auth_path).parent)
+        delta = self._device_sync.refresh()
+        return {
+            "changed": bool(delta),
+            "total": len(self._device_sync.snapshot),
+            "delta": delta.to_dict(),
+        }
+
     def list_shared_devices(self) -> List[Dict[str, Any]]:
         if self.use_mock:
             return []
@@ -244,16 +266,28 @@ class MijiaController:
                 {"time": 1700003600, "value": 1.5},
             ]
         api = self._ensure_api()
+        # 未指定 data_type 或 limit 时按分辨率自动选择粒度并拆分长时间段
+        if "resolution" in payload or "data_type" not in payload or "limit" not in payload:
+            return api.query_statistics(payload)
         return api.get_statistics(payload)
 
     def get_device_spec(self, model: str) -> Dict[str, Any]:
         if self.use_mock:
             raise RuntimeError("MOCK 模式下不支持获取在线规格")
-        cache_dir = Path(self.auth_path).with_name("spec_cache")
-        cache_dir.mkdir(parents=True, exist_ok=True)
+        # 与 mijiaDevice 共用认证文件所在目录下的规格存储
+        cache_dir = Path(self.auth_path).parent
+        legacy_dir = cache_dir / "spec_cache"
+        if legacy_dir.is_dir():
+            open_spec_store(cache_dir).migrate_json_cache(legacy_dir)
         info = get_device_info(model, cache_path=cache_dir)
         return info
 
+    def warm_spec_cache(self) -> Dict[str, Any]:
+        if self.use_mock:
+            return {"models": 0, "cached": 0, "fetched": [], "failed": {}}
+        api = self._ensure_api()
+        return warm_spec_cache(api, cache_path=Path(self.auth_path).parent)
+
     # endregion
 
     # region 设备操作
@@ -262,6 +296,14 @@ class MijiaController:
         identifier: DeviceIdentifier,
         include_shared: bool = True,
     ) -> Dict[str, Any]:
+        if not self.use_mock:
+            # 真实模式下通过 mijiaAPI 的设备索引 O(1) 查找，索引在多次调用间复用
+            api = self._ensure_api()
+            device = dict(api.device_registry.lookup(
+                did=identifier.did, name=identifier.name, include_shared=include_shared
+            ))
+            device["home_name"] = _select_home_name(self._ensure_home_map(), device.get("home_id"))
+            return device
         devices = self.list_devices(include_shared=include_shared)
         if identifier.did:
             matches = [device for device in devices if str(device.get("did")) == str(identifier.did)]
@@ -294,6 +336,8 @@ class MijiaController:
         identifier: DeviceIdentifier,
         properties: Optional[List[str]] = None,
         include_metadata: bool = True,
+        snapshot: bool = False,
+        max_age: Optional[float] = None,
     ) -> Dict[str, Any]:
         if self.use_mock:
             target = self._pick_device_record(identifier)
@@ -316,11 +360,11 @@ class MijiaController:
                 "model": device.model,
             },
         }
-        if properties:
-            values = {}
-            for prop in properties:
-                values[prop] = device.get(prop)
-            response["properties"] = values
+        if snapshot:
+            response["properties"] = device.snapshot(max_age=max_age)
+        elif properties:
+            # 合并为一次批量读取，避免逐个属性请求并等待 sleep_time
+            response["properties"] = device.get_many(properties, max_age=max_age)
         if include_metadata:
             response["available_properties"] = {
                 name: {
@@ -330,7 +374,6 @@ class MijiaController:
                     "unit": prop.unit,
                 }
                 for name, prop in device.prop_list.items()
-                if "_" not in name or name.replace("_", "-") not in device.prop_list
             }
             response["available_actions"] = {
                 name: {"desc": action.desc}
@@ -347,6 +390,7 @@ class MijiaController:
         action_name: Optional[str] = None,
         action_value: Optional[Any] = None,
         action_kwargs: Optional[Dict[str, Any]] = None,
+        values: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         if self.use_mock:
             return {
@@ -362,6 +406,16 @@ class MijiaController:
                 "success": True,
                 "message": f"{device.name} 的 {prop_name} 已设置为 {value}",
             }
+        if operation == "set_properties":
+            if not values:
+                raise ValueError("set_properties 操作需要 values")
+            results = device.set_many(values)
+            failed = [name for name, result in results.items() if result["code"] != 0]
+            return {
+                "success": not failed,
+                "message": f"{device.name} 已设置 {len(results) - len(failed)}/{len(results)} 个属性",
+                "results": results,
+            }
         if operation == "run_action":
             if not action_name:
                 raise ValueError("run_action 操作需要 action_name")
@@ -383,7 +437,7 @@ def build_controller(args: Dict[str, Any]) -> MijiaController:
     return MijiaController(
         auth_path=args.get("auth_path"),
         use_mock=args.get("use_mock"),
-        sleep_time=float(args.get("sleep_time", 0.5)),
+        sleep_time=float(args.get("sleep_time", 0.0)),
     )
 
 
@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""统一的米家工具脚本，根据 action 调用不同的 API 功能。"""
+"""统一的米家工具脚本，根据 action 调用不同的 API 功能。
+
+用法:
+    python mijia_tool.py '<json>'   单次调用，输出一行 JSON 后退出
+    python mijia_tool.py --worker   常驻模式，从 stdin 按行读取 JSON-RPC 请求，
+                                    向 stdout 按行写回响应，复用同一个 MijiaController；
+                                    请求并发处理，响应顺序不保证，按 id 对应
+"""
 from __future__ import annotations
 
 import json
 import sys
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
 
 from mijia_helper import (
     DeviceIdentifier,
@@ -35,8 +44,42 @@ def _bool_arg(args: Dict[str, Any], key: str, default: bool = False) -> bool:
     return default
 
 
-def handle_action(action: str, args: Dict[str, Any]) -> Dict[str, Any]:
-    controller: MijiaController = build_controller(args)
+def _float_arg(args: Dict[str, Any], key: str, default: Optional[float] = None) -> Optional[float]:
+    value = args.get(key, default)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+# 默认总是从云端读取属性，调用方通过 max_age 显式接受常驻 worker 中的属性缓存
+DEFAULT_PROP_MAX_AGE: Optional[float] = None
+
+# 常驻模式下同时处理的请求数
+WORKER_THREADS = 4
+
+_CONTROLLERS: Dict[Tuple[Any, ...], MijiaController] = {}
+_CONTROLLERS_LOCK = threading.Lock()
+_REPLY_LOCK = threading.Lock()
+
+
+def _get_controller(args: Dict[str, Any]) -> MijiaController:
+    """常驻模式下按配置复用 MijiaController，保持登录状态与 HTTP 会话"""
+    key = (args.get("auth_path"), args.get("use_mock"), args.get("sleep_time"))
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(key)
+        if controller is None:
+            controller = build_controller(args)
+            _CONTROLLERS[key] = controller
+    return controller
+
+
+def handle_action(
+    action: str,
+    args: Dict[str, Any],
+    controller: Optional[MijiaController] = None,
+) -> Dict[str, Any]:
+    if controller is None:
+        controller = build_controller(args)
 
     if action == "list_homes":
         homes = controller.list_homes()
@@ -52,7 +95,15 @@ def handle_action(action: str, args: Dict[str, Any]) -> Dict[str, Any]:
         identifier = _ensure_identifier(args)
         properties = args.get("properties")
         include_metadata = _bool_arg(args, "include_metadata", True)
-        result = controller.get_device_status(identifier, properties=properties, include_metadata=include_metadata)
+        snapshot = _bool_arg(args, "snapshot", False)
+        max_age = _float_arg(args, "max_age", DEFAULT_PROP_MAX_AGE)
+        result = controller.get_device_status(
+            identifier,
+            properties=properties,
+            include_metadata=include_metadata,
+            snapshot=snapshot,
+            max_age=max_age,
+        )
         return success_response(**result)
 
     if action == "control_device":
@@ -63,6 +114,7 @@ def handle_action(action: str, args: Dict[str, Any]) -> Dict[str, Any]:
         action_name = args.get("action_name")
         action_value = args.get("action_value")
         action_kwargs = args.get("action_kwargs") or args.get("params")
+        values = args.get("values")
         result = controller.control_device(
             identifier,
             operation=operation,
@@ -71,6 +123,7 @@ def handle_action(action: str, args: Dict[str, Any]) -> Dict[str, Any]:
             action_name=action_name,
             action_value=action_value,
             action_kwargs=action_kwargs,
+            values=values,
         )
         return success_response(**result)
 
@@ -104,10 +157,76 @@ def handle_action(action: str, args: Dict[str, Any]) -> Dict[str, Any]:
         info = controller.get_device_spec(model)
         return success_response(data=info)
 
+    if action == "sync_devices":
+        result = controller.sync_devices()
+        return success_response(data=result)
+
+    if action == "warm_spec_cache":
+        result = controller.warm_spec_cache()
+        return success_response(data=result)
+
     raise ValueError(f"未支持的 action: {action}")
 
 
+def _rpc_reply(out: Any, req_id: Any, result: Any = None, error: Optional[Dict[str, Any]] = None) -> None:
+    message: Dict[str, Any] = {"jsonrpc": "2.0", "id": req_id}
+    if error is not None:
+        message["error"] = error
+    else:
+        message["result"] = result
+    line = json.dumps(message, ensure_ascii=False) + "\n"
+    with _REPLY_LOCK:
+        out.write(line)
+        out.flush()
+
+
+def _dispatch(out: Any, req_id: Any, action: str, params: Dict[str, Any]) -> None:
+    try:
+        result = handle_action(action, params, controller=_get_controller(params))
+    except Exception as exc:  # noqa: BLE001
+        result = handle_exception(exc)
+    _rpc_reply(out, req_id, result=result)
+
+
+def serve() -> None:
+    """常驻 worker：逐行读取 JSON-RPC 请求并交给线程池并发处理，stdout 仅用于输出响应"""
+    out = sys.stdout
+    # 库内部的 print（如扫码提示）不能污染响应通道；redirect_stdout 是进程级的，
+    # 多线程下无法按请求切换，因此整个 worker 生命周期内都把 stdout 指向 stderr
+    sys.stdout = sys.stderr
+    executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="mijia-rpc")
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as exc:
+                _rpc_reply(out, None, error={"code": -32700, "message": f"无效的 JSON: {exc}"})
+                continue
+            if not isinstance(request, dict):
+                _rpc_reply(out, None, error={"code": -32600, "message": "请求必须是 JSON 对象"})
+                continue
+            req_id = request.get("id")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                _rpc_reply(out, req_id, error={"code": -32602, "message": "params 必须是 JSON 对象"})
+                continue
+            action = request.get("method") or params.get("action")
+            if not action:
+                _rpc_reply(out, req_id, error={"code": -32600, "message": "缺少 method 参数"})
+                continue
+            executor.submit(_dispatch, out, req_id, action, params)
+    finally:
+        executor.shutdown(wait=True)
+        sys.stdout = out
+
+
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        serve()
+        return
     raw = sys.argv[1] if len(sys.argv) > 1 else "{}"
     try:
         payload = json.loads(raw)
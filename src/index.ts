@@ -8,7 +8,8 @@ import {
   ListToolsRequestSchema,
   Tool,
 } from "@modelcontextprotocol/sdk/types.js";
-import { execFile } from "child_process";
+import { ChildProcessWithoutNullStreams, execFile, spawn } from "child_process";
+import readline from "node:readline";
 import { promisify } from "util";
 
 const execFileAsync = promisify(execFile);
@@ -18,6 +19,14 @@ const SERVER_VERSION = "1.1.0";
 
 const PYTHON_PATH = process.env.PYTHON_PATH || "python";
 const PYTHON_SCRIPT_DIR = process.env.PYTHON_SCRIPT_DIR || "./python_scripts";
+// 设置 MIJIA_WORKER=0 可回退到每次调用启动一个 Python 进程
+const USE_WORKER = !["0", "false", "no"].includes((process.env.MIJIA_WORKER ?? "1").toLowerCase());
+const WORKER_TIMEOUT_MS = Number(process.env.MIJIA_WORKER_TIMEOUT_MS || 120000);
+const WORKER_RESTART_DELAY_MS = 1000;
+// 启动时在后台（独立进程）预取所有设备规格，避免交互调用时再等待规格下载
+const WARM_SPEC_CACHE = !["0", "false", "no"].includes(
+  (process.env.MIJIA_WARM_SPEC_CACHE ?? "1").toLowerCase()
+);
 
 function resolveScriptPath(scriptName: string): string {
   const baseDir = path.isAbsolute(PYTHON_SCRIPT_DIR)
@@ -55,11 +64,138 @@ async function callPythonScript(
   }
 }
 
+interface PendingCall {
+  method: string;
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+  timer: NodeJS.Timeout;
+}
+
+/**
+ * 常驻的 mijia_tool.py worker，通过 stdin/stdout 按行传输 JSON-RPC。
+ * 并发请求按 id 复用同一个进程，进程退出后在下一次调用时自动重启。
+ */
+class PythonWorker {
+  private child: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<number, PendingCall>();
+  private nextId = 1;
+  private lastStart = 0;
+  private starting: Promise<ChildProcessWithoutNullStreams> | null = null;
+
+  constructor(private readonly scriptName: string) {}
+
+  private ensureStarted(): Promise<ChildProcessWithoutNullStreams> {
+    if (this.child) {
+      return Promise.resolve(this.child);
+    }
+    if (!this.starting) {
+      this.starting = this.start().finally(() => {
+        this.starting = null;
+      });
+    }
+    return this.starting;
+  }
+
+  private async start(): Promise<ChildProcessWithoutNullStreams> {
+    const wait = this.lastStart + WORKER_RESTART_DELAY_MS - Date.now();
+    if (wait > 0) {
+      // 避免崩溃后紧密循环重启
+      await new Promise((resolve) => setTimeout(resolve, wait));
+    }
+    this.lastStart = Date.now();
+
+    const child = spawn(PYTHON_PATH, [resolveScriptPath(this.scriptName), "--worker"], {
+      env: { ...process.env, PYTHONUNBUFFERED: "1", PYTHONIOENCODING: "utf-8" },
+    });
+    this.child = child;
+
+    readline.createInterface({ input: child.stdout }).on("line", (line) => this.onLine(line));
+    child.stderr.on("data", (chunk: Buffer) => {
+      console.error(`[python:${this.scriptName}] ${chunk.toString().trimEnd()}`);
+    });
+    child.stdin.on("error", (error) => this.onExit(child, `Python worker 输入通道异常: ${error.message}`));
+    child.on("error", (error) => this.onExit(child, `无法启动 Python worker: ${error.message}`));
+    child.on("exit", (code, signal) =>
+      this.onExit(child, `Python worker 已退出 (code=${code}, signal=${signal})`)
+    );
+    return child;
+  }
+
+  private onLine(line: string) {
+    const text = line.trim();
+    if (!text) {
+      return;
+    }
+    let message: any;
+    try {
+      message = JSON.parse(text);
+    } catch {
+      console.error(`[python:${this.scriptName}] 无法解析的输出: ${text}`);
+      return;
+    }
+    const call = this.pending.get(message.id);
+    if (!call) {
+      if (message.error) {
+        console.error(`[python:${this.scriptName}] ${message.error.message}`);
+      }
+      return;
+    }
+    this.pending.delete(message.id);
+    clearTimeout(call.timer);
+    if (message.error) {
+      call.reject(new Error(message.error.message ?? String(message.error)));
+    } else {
+      call.resolve(message.result);
+    }
+  }
+
+  private onExit(child: ChildProcessWithoutNullStreams, reason: string) {
+    if (this.child !== child) {
+      return;
+    }
+    this.child = null;
+    console.error(`[python:${this.scriptName}] ${reason}`);
+    for (const [id, call] of this.pending) {
+      clearTimeout(call.timer);
+      call.reject(new Error(`${reason}，请求 ${call.method} 未完成`));
+      this.pending.delete(id);
+    }
+  }
+
+  async call(method: string, params: Record<string, unknown> = {}): Promise<any> {
+    const child = await this.ensureStarted();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Python worker 调用超时 (${method}, ${WORKER_TIMEOUT_MS}ms)`));
+        // 超时的请求可能卡住了 worker，重启以免阻塞后续调用
+        child.kill();
+      }, WORKER_TIMEOUT_MS);
+      this.pending.set(id, { method, resolve, reject, timer });
+      child.stdin.write(JSON.stringify({ jsonrpc: "2.0", id, method, params }) + "\n");
+    });
+  }
+
+  stop() {
+    this.child?.kill();
+  }
+}
+
+const mijiaWorker = new PythonWorker("mijia_tool.py");
+
 async function callMijiaAction(
   action: string,
   params: Record<string, unknown> = {}
 ): Promise<any> {
-  return callPythonScript("mijia_tool.py", { ...params, action });
+  if (!USE_WORKER) {
+    return callPythonScript("mijia_tool.py", { ...params, action });
+  }
+  try {
+    return await mijiaWorker.call(action, { ...params, action });
+  } catch (error) {
+    throw new Error(`Python worker 执行失败 (${action}): ${error instanceof Error ? error.message : error}`);
+  }
 }
 
 function asTextContent(result: unknown) {
@@ -109,6 +245,19 @@ const TOOLS: Tool[] = [
       },
     },
   },
+  {
+    name: "sync_mijia_devices",
+    description: "同步设备列表，返回与上次同步相比的变化：新增、移除、改名、移动家庭/房间、上下线、固件更新",
+    inputSchema: {
+      type: "object",
+      properties: {
+        use_mock: {
+          type: "boolean",
+          description: "是否启用模拟数据模式",
+        },
+      },
+    },
+  },
   {
     name: "get_device_status",
     description: "获取设备属性并返回可用属性/动作列表",
@@ -126,7 +275,16 @@ const TOOLS: Tool[] = [
         properties: {
           type: "array",
           items: { type: "string" },
-          description: "需要读取的属性名称数组，例如 on、brightness",
+          description: "需要读取的属性名称数组，例如 on、brightness（一次批量读取）",
+        },
+        snapshot: {
+          type: "boolean",
+          default: false,
+          description: "读取设备全部可读属性（忽略 properties）",
+        },
+        max_age: {
+          type: "number",
+          description: "可接受的属性缓存时间（秒），同时受属性自身有效期限制（传感器 5 秒、可写属性 60 秒）；不传时总是从云端读取",
         },
         include_metadata: {
           type: "boolean",
@@ -135,8 +293,8 @@ const TOOLS: Tool[] = [
         },
         sleep_time: {
           type: "number",
-          description: "读取属性之间的等待时间（秒）",
-          default: 0.5,
+          description: "每次读写之后的额外等待时间（秒），默认不等待，由 mijiaAPI 限流器控制请求频率",
+          default: 0,
         },
         use_mock: {
           type: "boolean",
@@ -158,7 +316,7 @@ const TOOLS: Tool[] = [
         device_name: { type: "string" },
         operation: {
           type: "string",
-          enum: ["set_property", "run_action"],
+          enum: ["set_property", "set_properties", "run_action"],
           default: "set_property",
         },
         prop_name: {
@@ -168,6 +326,10 @@ const TOOLS: Tool[] = [
         value: {
           description: "属性值，可以是 number/string/bool",
         },
+        values: {
+          type: "object",
+          description: "属性名称到属性值的映射（set_properties 时必填，一次请求写入多个属性）",
+        },
         action_name: {
           type: "string",
           description: "动作名称（run_action 时必填）",
@@ -247,7 +409,8 @@ const TOOLS: Tool[] = [
       properties: {
         payload: {
           type: "object",
-          description: "原始统计查询参数，需包含 did/key/data_type/time_start/time_end/limit",
+          description:
+            "统计查询参数，需包含 did/key/time_start/time_end；可用 resolution（hour/day/week/month）自动选择粒度并拆分长时间段，或直接指定 data_type/limit",
         },
         use_mock: {
           type: "boolean",
@@ -302,6 +465,8 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
         return asTextContent(await callMijiaAction("list_homes", toolArgs));
       case "get_mijia_devices":
         return asTextContent(await callMijiaAction("list_devices", toolArgs));
+      case "sync_mijia_devices":
+        return asTextContent(await callMijiaAction("sync_devices", toolArgs));
       case "get_device_status":
         return asTextContent(await callMijiaAction("device_status", toolArgs));
       case "control_device":
@@ -346,6 +511,14 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
 async function main() {
   const transport = new StdioServerTransport();
   await server.connect(transport);
+  process.on("exit", () => mijiaWorker.stop());
+  if (WARM_SPEC_CACHE) {
+    // 预取在独立的一次性 Python 进程中执行，不占用交互 worker，也不受 worker 调用超时限制；
+    // 规格写入共享的 SQLite 规格库，worker 随后直接命中
+    callPythonScript("mijia_tool.py", { action: "warm_spec_cache" })
+      .then((result) => console.error(`设备规格预取完成: ${JSON.stringify(result?.data ?? result)}`))
+      .catch((error) => console.error(`设备规格预取失败: ${error instanceof Error ? error.message : error}`));
+  }
   console.error(`${SERVER_NAME} v${SERVER_VERSION} 已启动`);
 }
 